@@ -0,0 +1,109 @@
+import os
+import time
+import logging
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("Artifacts")
+
+SCREENSHOT_DIR = "/app/screenshots/"
+VIDEO_DIR = "/app/videos/"
+
+# none: nothing; failure: screenshots of failed steps only; full: every step plus video
+ARTIFACT_LEVEL = os.getenv("ARTIFACT_LEVEL", "failure")
+VIDEO_ENABLED = ARTIFACT_LEVEL == "full"
+
+ARTIFACT_MAX_AGE_DAYS = float(os.getenv("ARTIFACT_MAX_AGE_DAYS", "7"))
+ARTIFACT_MAX_TOTAL_MB = float(os.getenv("ARTIFACT_MAX_TOTAL_MB", "500"))
+PRUNE_INTERVAL = 60
+
+class ArtifactStore:
+    """Screenshots and videos per ARTIFACT_LEVEL; file writes and retention run on a background thread."""
+
+    def __init__(self, level=ARTIFACT_LEVEL, screenshot_dir=SCREENSHOT_DIR, video_dir=VIDEO_DIR,
+                 max_age_days=ARTIFACT_MAX_AGE_DAYS, max_total_mb=ARTIFACT_MAX_TOTAL_MB):
+        self.level = level
+        self.screenshot_dir = screenshot_dir
+        self.video_dir = video_dir
+        self.max_age = timedelta(days=max_age_days)
+        self.max_total_bytes = int(max_total_mb * 1024 * 1024)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="artifacts")
+        self._last_prune = 0.0
+        if level != "none":
+            os.makedirs(screenshot_dir, exist_ok=True)
+            os.makedirs(video_dir, exist_ok=True)
+
+    def wants(self, failure=False):
+        return self.level == "full" or (self.level == "failure" and failure)
+
+    async def screenshot(self, page, name, failure=False):
+        if not self.wants(failure):
+            return
+        try:
+            # Only the capture touches the page; the disk write is handed off
+            data = await page.screenshot(full_page=True)
+        except Exception as e:
+            logger.warning(f"Screenshot {name} failed: {e}")
+            return
+        self._executor.submit(self._write, os.path.join(self.screenshot_dir, f"{name}.png"), data)
+
+    def save_video(self, source, name):
+        # `source` is the finished recording (page already closed); renaming it is left to the thread
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        target = os.path.join(self.video_dir, f"{name}_{timestamp}.webm")
+        self._executor.submit(self._move, source, target)
+        return target
+
+    def _write(self, path, data):
+        try:
+            with open(path, "wb") as f:
+                f.write(data)
+        except Exception as e:
+            logger.warning(f"Failed to write {path}: {e}")
+        self._maybe_prune()
+
+    def _move(self, source, target):
+        try:
+            os.replace(source, target)
+        except Exception as e:
+            logger.warning(f"Failed to save video {target}: {e}")
+        self._maybe_prune()
+
+    def _maybe_prune(self):
+        if time.monotonic() - self._last_prune < PRUNE_INTERVAL:
+            return
+        self._last_prune = time.monotonic()
+        self.prune()
+
+    def prune(self):
+        # Drop anything past max age, then the oldest files until under the size cap
+        files = []
+        for directory in {self.screenshot_dir, self.video_dir}:
+            try:
+                entries = list(os.scandir(directory))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if entry.is_file():
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        files.sort()
+        cutoff = (datetime.now() - self.max_age).timestamp()
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for mtime, size, path in files:
+            if mtime >= cutoff and total <= self.max_total_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        if removed:
+            logger.info(f"Pruned {removed} artifact(s), {total / 1024 / 1024:.1f}MB kept.")
+        return removed
+
+    def close(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,229 @@
+# Offline benchmark: availability checks, the booking critical path and worker throughput against mock_site.py.
+#
+#   python benchmark.py --latency-ms 50 --slots 12 --checks 20 --bookings 3 --worker-tasks 30 --worker-seconds 60
+#
+# Runs on a scratch SQLite database. An existing DATABASE_URL is refused unless --allow-database is passed; the
+# Benchmark tasks seeded there are stopped on exit. --json keeps results for comparison across releases.
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+import tempfile
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Better Booking offline benchmark")
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--latency-ms", type=int, default=50, help="mock server latency per response")
+    parser.add_argument("--slots", type=int, default=12, help="slots listed per availability page")
+    parser.add_argument("--checks", type=int, default=20, help="availability checks to time (browser and probe)")
+    parser.add_argument("--bookings", type=int, default=3, help="bookings to run through to confirmation")
+    parser.add_argument("--checkout-mode", choices=["standard", "fast"], default=os.getenv("CHECKOUT_MODE", "standard"))
+    parser.add_argument("--worker-tasks", type=int, default=30, help="check-only tasks seeded for the worker run")
+    parser.add_argument("--worker-seconds", type=int, default=60)
+    parser.add_argument("--mode", choices=["sequential", "async"], default="async")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--allow-database", action="store_true", help="seed into DATABASE_URL instead of a scratch database")
+    return parser.parse_args(argv)
+
+def configure(args):
+    # Must run before bot/models are imported: they read these at import time
+    base = f"http://127.0.0.1:{args.port}"
+    if os.getenv("DATABASE_URL") and not args.allow_database:
+        # Seeded tasks are real tasks: any worker on that database would pick them up
+        raise SystemExit("DATABASE_URL is set; pass --allow-database to seed Benchmark tasks into it, or unset it for a scratch database.")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='bench-')}/benchmark.db")
+    os.environ["BOOKING_SITE_URL"] = base
+    os.environ["AVAILABILITY_API_URL"] = f"{base}/api"
+    os.environ.setdefault("ARTIFACT_LEVEL", "none")
+    os.environ.setdefault("WORKER_ID", f"benchmark-{os.getpid()}")
+    # Recheck as soon as possible so the worker run measures capacity, not the schedule
+    for name in ("NEAR", "SOON", "DEFAULT", "FAR"):
+        os.environ.setdefault(f"CHECK_INTERVAL_{name}_SECONDS", "0")
+
+def migrate():
+    # Schema first: models binds its tables to whatever exists when it is imported
+    subprocess.run([sys.executable, str(Path(__file__).parent / "migrate.py")], check=True)
+
+def start_mock(port, latency_ms, slot_count):
+    import uvicorn
+    from mock_site import create_app
+    server = uvicorn.Server(uvicorn.Config(create_app(latency_ms, slot_count), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+def summarize(seconds):
+    return {"n": len(seconds), "p50_ms": percentile(seconds, 0.5) * 1000, "p95_ms": percentile(seconds, 0.95) * 1000,
+            "max_ms": max(seconds) * 1000} if seconds else {"n": 0}
+
+def fmt(s):
+    if not s["n"]:
+        return "no samples"
+    return f"p50 {s['p50_ms']:.0f}ms  p95 {s['p95_ms']:.0f}ms  max {s['max_ms']:.0f}ms  (n={s['n']})"
+
+# Every task seed() created, so none is left active once the run ends
+SEEDED = []
+
+def seed(count, target_time_start=None):
+    from models import users, payments, tasks, UserAccount, PaymentProfile, Task, TaskStatus, LeisureCentre, encrypt_value
+    user = users.insert(UserAccount(name="Benchmark", email="bench@example.com", password_encrypted=encrypt_value("benchmark")))
+    payment = payments.insert(PaymentProfile(
+        user_account_id=user.id, alias="Benchmark", cardholder_name="Bench Mark", card_number_encrypted=encrypt_value("4111 1111 1111 1111"),
+        expiry_month="12", expiry_year="30", cvv_encrypted=encrypt_value("123"), address_line_1="1 Bench Street", city="London",
+        postcode="N1 1AA", card_last4="1111"))
+    centres = list(LeisureCentre)
+    # Released dates only (tomorrow .. +5), so nothing is parked for the sniper
+    seeded = [tasks.insert(Task(user_account_id=user.id, payment_profile_id=payment.id, leisure_centre=centres[i % len(centres)].value,
+                                target_date=str(date.today() + timedelta(days=1 + (i // len(centres)) % 5)), duration=(60, 40)[i % 2],
+                                status=TaskStatus.PENDING.value, target_time_start=target_time_start))
+              for i in range(count)]
+    SEEDED.extend(seeded)
+    return seeded
+
+def stop_seeded():
+    from models import tasks, TaskStatus
+    for t in SEEDED:
+        task = tasks[t.id]
+        if task.status in (TaskStatus.PENDING.value, TaskStatus.RUNNING.value):
+            task.status = TaskStatus.STOPPED.value
+            tasks.update(task)
+    SEEDED.clear()
+
+async def bench_checks(args):
+    from bot import BookingBot
+    from browser_pool import BrowserPool
+    from probe import HttpProbe
+    from slots import availability_url
+
+    task = seed(1, target_time_start="05:00")[0]
+    url = availability_url(task)
+    bot = BookingBot(headless=True, pool=BrowserPool(headless=True))
+    await bot.pool.start()
+    browser, probed = [], []
+    try:
+        await bot.check_availability(url, [task])  # warm-up
+        for _ in range(args.checks):
+            started = time.perf_counter()
+            await bot.check_availability(url, [task])
+            browser.append(time.perf_counter() - started)
+    finally:
+        await bot.pool.close()
+        bot.log_sink.close()
+        bot.metrics.close()
+
+    probe = HttpProbe()
+    try:
+        for _ in range(args.checks):
+            started = time.perf_counter()
+            await probe.check(task)
+            probed.append(time.perf_counter() - started)
+    finally:
+        await probe.close()
+    return {"browser": summarize(browser), "probe": summarize(probed)}
+
+async def bench_bookings(args):
+    from sqlalchemy import text
+    from models import db, tasks
+    from bot import BookingBot
+    from browser_pool import BrowserPool
+    from metrics import STEP_SECONDS
+    from slots import availability_url
+
+    booked = seed(args.bookings)
+    bot = BookingBot(headless=True, pool=BrowserPool(headless=True), checkout_mode=args.checkout_mode)
+    await bot.pool.start()
+    totals = []
+    try:
+        for task in booked:
+            # The check is timed separately; this is slot match -> confirmation
+            slots = await bot.check_availability(availability_url(task), [task])
+            started = time.perf_counter()
+            await bot.run_task(task, slots=slots)
+            totals.append(time.perf_counter() - started)
+    finally:
+        await bot.pool.close()
+        bot.log_sink.close()
+        bot.metrics.close()
+
+    rows = db.execute(text("SELECT label, value FROM metric WHERE name = :name AND worker_id = :worker AND task_id IN ({})".format(
+        ",".join(str(t.id) for t in booked))), {"name": STEP_SECONDS, "worker": bot.metrics.worker_id}).all()
+    db.conn.commit()
+    steps = {}
+    for label, value in rows:
+        steps.setdefault(label, []).append(value)
+    succeeded = sum(tasks[t.id].status == "SUCCESS" for t in booked)
+    return {"mode": args.checkout_mode, "succeeded": succeeded, "total": summarize(totals),
+            "steps": {label: summarize(values) for label, values in steps.items()}}
+
+async def bench_worker(args):
+    from bot import BookingBot, worker_loop
+    from browser_pool import BrowserPool, POOL_SIZE
+    from probe import HttpProbe, PROBE_MODE
+    from metrics import CHECKS_PER_MINUTE
+
+    seed(args.worker_tasks, target_time_start="05:00")  # Never matches a mock slot: check-only load
+    concurrency = 1 if args.mode == "sequential" else args.concurrency
+    bot = BookingBot(headless=True, pool=BrowserPool(headless=True, size=max(POOL_SIZE, concurrency)), concurrency=concurrency,
+                     probe=HttpProbe() if PROBE_MODE == "http" else None)
+    job = asyncio.create_task(worker_loop(args.mode, concurrency, bot=bot))
+    # Clock starts once the browser is up, so launch time isn't counted as throughput
+    while bot.pool.browser is None and not job.done():
+        await asyncio.sleep(0.05)
+    started, before = time.perf_counter(), bot.metrics.totals[CHECKS_PER_MINUTE]
+    await asyncio.sleep(args.worker_seconds)
+    checked = bot.metrics.totals[CHECKS_PER_MINUTE] - before
+    elapsed = time.perf_counter() - started
+    job.cancel()
+    await asyncio.gather(job, return_exceptions=True)
+    return {"mode": args.mode, "concurrency": concurrency, "tasks": args.worker_tasks, "seconds": elapsed,
+            "tasks_checked": checked, "tasks_per_minute": checked * 60 / elapsed}
+
+async def run(args):
+    results = {"latency_ms": args.latency_ms, "slots": args.slots}
+    print(f"Mock site at {os.environ['BOOKING_SITE_URL']} ({args.latency_ms}ms latency, {args.slots} slots); DB {os.environ['DATABASE_URL']}")
+
+    results["checks"] = await bench_checks(args)
+    print(f"Check latency (browser): {fmt(results['checks']['browser'])}")
+    print(f"Check latency (probe):   {fmt(results['checks']['probe'])}")
+
+    if args.bookings:
+        results["booking"] = b = await bench_bookings(args)
+        print(f"Booking critical path ({b['mode']}, {b['succeeded']}/{args.bookings} confirmed): {fmt(b['total'])}")
+        for label, s in b["steps"].items():
+            print(f"    {label:<20} {fmt(s)}")
+
+    if args.worker_seconds:
+        results["worker"] = w = await bench_worker(args)
+        print(f"Worker ({w['mode']}, concurrency {w['concurrency']}, {w['tasks']} tasks): "
+              f"{w['tasks_checked']} checks in {w['seconds']:.0f}s = {w['tasks_per_minute']:.1f} tasks/minute")
+    return results
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure(args)
+    migrate()
+    server = start_mock(args.port, args.latency_ms, args.slots)
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        stop_seeded()
+        server.should_exit = True
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,32 +1,155 @@
 import os
+import re
 import time
+import asyncio
+import argparse
 import logging
-from datetime import datetime
-from playwright.sync_api import sync_playwright, TimeoutError
-from playwright_stealth import Stealth
-from main import db, tasks, users, payments, bookings, logs, Task, TaskStatus, LogLevel, encrypt_value, decrypt_value, SystemLog, Booking
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from playwright.async_api import TimeoutError, expect
+from browser_pool import BrowserPool, POOL_SIZE
+from slots import SLOT_SELECTOR, NO_RESULTS_TEXT, availability_url, slot_url, match_slot, slot_selector, extract_slots, slot_from_href
+from sniper import Sniper, in_snipe_window
+from scheduling import plan_check, PARK, EXPIRE
+from events import TaskListener
+from probe import HttpProbe, PROBE_MODE
+from sessions import SessionCache
+from task_queue import TaskQueue, claim_group_win, stop_siblings
+from log_sink import LogSink
+from artifacts import ArtifactStore
+from credentials import CredentialCache
+from metrics import Metrics, METRICS_INTERVAL, CHECK_SECONDS, CYCLE_SECONDS, QUEUE_DEPTH, CHECKS_PER_MINUTE
+from history import record_observation
+from models import db, tasks, users, payments, bookings, Task, TaskStatus, LogLevel, encrypt_value, SystemLog, Booking, require_schema
+
+# "fast": state-based waits and fill() into the card iframe; "standard": the original fixed sleeps and 100ms keystrokes
+CHECKOUT_MODE = os.getenv("CHECKOUT_MODE", "standard")
+
+# After an attempt that failed part way (booking errors, unexpected exceptions), the next check is pushed back:
+# RETRY_BACKOFF_SECONDS, doubling per consecutive failure, capped at RETRY_BACKOFF_MAX_SECONDS
+RETRY_BACKOFF = int(os.getenv("RETRY_BACKOFF_SECONDS", "60"))
+RETRY_BACKOFF_MAX = int(os.getenv("RETRY_BACKOFF_MAX_SECONDS", "1800"))
 
 # Configure Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("BookingBot")
 
 class BookingBot:
-    def __init__(self, headless=True):
+    def __init__(self, headless=True, pool=None, concurrency=1, probe=None, checkout_mode=CHECKOUT_MODE):
         self.headless = headless
-        os.makedirs("/app/screenshots", exist_ok=True)
-        os.makedirs("/app/videos", exist_ok=True)
+        self.fast_checkout = checkout_mode == "fast"
+        self.pool = pool or BrowserPool(headless=headless)
+        # Optional HttpProbe: availability without rendering, browser only for booking
+        self.probe = probe
+        self.sessions = SessionCache()
+        self.secrets = CredentialCache()
+        self.log_sink = LogSink().start()
+        # Bounds concurrent browser work (checks and bookings) across the worker
+        self.limit = asyncio.Semaphore(concurrency)
+        self.artifacts = ArtifactStore()
+        self.metrics = Metrics().start()
+        # task id -> consecutive failed attempts, for the retry backoff
+        self.failures = {}
 
     def log(self, level, message, task_id=None):
         print(f"[{level}] {message}")
+        # Buffered; the DB write happens in bulk off the booking path
+        self.log_sink.write(SystemLog(level=level, source="BookingBot", message=message, task_id=task_id))
+
+    async def save_video(self, page, name, task_id=None):
         try:
-            logs.insert(SystemLog(level=level, source="BookingBot", message=message, task_id=task_id))
+            # Closing the page (not the pooled context) finalises its video
+            await page.close()
+            if page.video:
+                new_path = self.artifacts.save_video(await page.video.path(), name)
+                self.log(LogLevel.INFO, f"Video saved to {new_path}", task_id)
         except Exception as e:
-            print(f"Failed to write log to DB: {e}")
+            self.log(LogLevel.WARN, f"Failed to save video: {e}", task_id)
+
+    async def accept_cookies(self, page):
+        try:
+            await page.get_by_role("button", name="Accept All Cookies").click(timeout=5000)
+        except:
+            pass
+
+    async def check_availability(self, url, group):
+        # One check per availability URL; returns Slots, or None if the check itself failed
+        task_ids = [t.id for t in group]
+        self.log(LogLevel.INFO, f"Checking URL: {url} (tasks: {', '.join(str(i) for i in task_ids)})")
+
+        if self.probe:
+            try:
+                slots = [s for s in map(slot_from_href, await self.probe.check(group[0])) if s]
+                self.log(LogLevel.INFO, f"Probe found {len(slots)} slot(s) at {url}.")
+                return slots
+            except Exception as e:
+                self.log(LogLevel.WARN, f"HTTP probe failed for {url}, falling back to page load: {e}")
+
+        label = f"group_{task_ids[0]}"
+        async with self.limit, self.pool.lease(light=True) as lease:
+            page = lease.page
+            try:
+                await page.goto(url)
+
+                await self.artifacts.screenshot(page, f"step0_page_load_{label}")
+
+                await self.accept_cookies(page)
+
+                # Check for "No results"
+                if await page.get_by_text(NO_RESULTS_TEXT).is_visible():
+                    self.log(LogLevel.INFO, f"No slots found at {url}.")
+                    return []
+
+                try:
+                    await page.wait_for_selector(SLOT_SELECTOR, timeout=10000)
+                except TimeoutError:
+                    # Not the same as "No results": the page may just be slow, so this is no answer (None), not an empty list
+                    self.log(LogLevel.INFO, f"Timeout waiting for slots (or none visible) at {url}.")
+                    return None
+
+                # One in-page evaluation for every listed slot
+                slots = await extract_slots(page)
+
+                step = "step2_slots_found" if slots else "step2_slots_not_found"
+                await self.artifacts.screenshot(page, f"{step}_{label}")
+
+                self.log(LogLevel.INFO, f"Found {len(slots)} slot(s) at {url}.")
+                return slots
+            except Exception as e:
+                self.log(LogLevel.ERROR, f"Availability check failed for {url}: {e}")
+                await self.artifacts.screenshot(page, f"error_check_{label}", failure=True)
+                lease.failed = True
+                return None
+            finally:
+                # Check contexts never record, so there is no video to keep
+                await page.close()
 
-    def run_task(self, task: Task):
+    async def run_task(self, task: Task, slots=None):
+        # Each numbered step below is timed into booking_step_seconds
+        steps = self.metrics.steps(task.id)
+        checked = task.last_checked_at
+        try:
+            await self._run_task(task, slots, steps)
+        finally:
+            steps.finish()
+            self.finish_attempt(task, checked)
+
+    def finish_attempt(self, task, checked):
+        # checked: task.last_checked_at before the attempt. Every path that finished normally has rescheduled
+        # the task (or ended it); one that didn't failed part way and must not be left due for an instant retry.
+        if task.status not in (TaskStatus.PENDING.value, TaskStatus.RUNNING.value) or task.last_checked_at is not checked:
+            self.failures.pop(task.id, None)
+            return
+        failures = self.failures[task.id] = self.failures.get(task.id, 0) + 1
+        delay = min(RETRY_BACKOFF_MAX, RETRY_BACKOFF * 2 ** (failures - 1))
+        self.log(LogLevel.WARN, f"Attempt failed ({failures} in a row); next check in {delay}s.", task.id)
+        self.update_task_last_checked(task, retry_after=delay)
+
+    async def _run_task(self, task, slots, steps):
         self.log(LogLevel.INFO, f"Starting task {task.id} for {task.leisure_centre} on {task.target_date}", task.id)
         
         # 1. Fetch User & Payment
+        steps.start("fetch_account")
         try:
             user = users[task.user_account_id]
             payment = payments[task.payment_profile_id]
@@ -36,364 +159,513 @@ class BookingBot:
             return
 
         # 2. Construct URL
-        duration_slug = f"badminton-{task.duration}min"
-        url = f"https://bookings.better.org.uk/location/{task.leisure_centre}/{duration_slug}/{task.target_date}/by-time"
-        
-        with sync_playwright() as p:
-            # Use realistic User Agent to avoid blocking
-            browser = p.chromium.launch(
-                headless=self.headless,
-                args=["--disable-blink-features=AutomationControlled"]
-            )
-            context = browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                record_video_dir="/app/videos/",
-                record_video_size={"width": 1280, "height": 1440},
-                viewport={"width": 1280, "height": 1440}
-            )
-            page = context.new_page()
-            Stealth().apply_stealth_sync(page)
+        url = availability_url(task)
+
+        # 3. Check Availability (skipped when the worker already loaded this page for the group)
+        if slots is None:
+            steps.start("check_availability")
+            slots = await self.check_availability(url, [task])
+            if slots is None:
+                self.update_task_last_checked(task)
+                return
+
+        # Filter Slots based on Preference
+        if task.target_time_start:
+            self.log(LogLevel.INFO, f"Looking for slot starting at {task.target_time_start}...", task.id)
+        steps.finish()
+        target = match_slot(task, slots)
+        if not target:
+            if slots and task.target_time_start:
+                self.log(LogLevel.INFO, f"No slot found matching time {task.target_time_start}.", task.id)
+            else:
+                self.log(LogLevel.INFO, "No booking slots found.", task.id)
+            self.update_task_last_checked(task)
+            return
+
+        self.log(LogLevel.INFO, f"Matching slot {target.key}{f' ({target.court})' if target.court else ''}, starting booking...", task.id)
+        self.secrets.warm(user.password_encrypted, payment.card_number_encrypted, payment.cvv_encrypted)
+
+        # Only now pay for a booking context (stealth, video, the account's cached session), and go straight to the slot
+        async with self.limit, self.pool.lease(storage_state=self.sessions.get(user.id), booking=True) as lease:
+            page = lease.page
+            target_url = slot_url(target)
 
             try:
-                # 3. Check Availability
-                self.log(LogLevel.INFO, f"Checking URL: {url}", task.id)
-                page.goto(url)
-                
-                try: page.screenshot(path=f"/app/screenshots/step0_page_load_{task.id}.png", full_page=True)
-                except Exception as e: self.log(LogLevel.ERROR, f"Screenshot 0 failed: {e}", task.id)
-                
-                # Cookie Consent
-                try:
-                    page.get_by_role("button", name="Accept All Cookies").click(timeout=5000)
-                except:
-                    pass 
+                steps.start("page_load")
+                await page.goto(target_url)
+                steps.start("cookie_banner")
+                await self.accept_cookies(page)
 
-                # Check for "No results"
-                if page.get_by_text("No results were found at this centre").is_visible():
-                    self.log(LogLevel.INFO, "No slots found.", task.id)
-                    self.update_task_last_checked(task)
-                    return 
-
-                # 4. Pre-emptive Login
-                # Check for main "Log in" button (header)
-                # Use test_id to avoid matching other login buttons (e.g. empty basket)
-                login_btn = page.get_by_test_id("login")
-                if login_btn.is_visible():
-                    self.log(LogLevel.INFO, "Performing pre-emptive login...", task.id)
-                    try:
-                        login_btn.click()
-                        # Wait for login form
-                        page.wait_for_selector("input[id='password']", timeout=10000)
-                        
-                        page.get_by_label("Email address or customer ID").fill(user.email)
-                        pwd = decrypt_value(user.password_encrypted)
-                        page.get_by_label("Password", exact=True).fill(pwd)
-                        page.get_by_role("button", name="Log in").click()
-                        
-                        # Wait for redirect back
-                        page.wait_for_url(url, timeout=30000)
-                        self.log(LogLevel.INFO, "Login successful, returned to availability page.", task.id)
-                        try: page.screenshot(path=f"/app/screenshots/step1_login_success_{task.id}.png", full_page=True)
-                        except Exception as e: self.log(LogLevel.ERROR, f"Screenshot 1 failed: {e}", task.id)
-                    except Exception as e:
-                        try: page.screenshot(path=f"/app/screenshots/step1_login_failed_{task.id}.png", full_page=True)
-                        except Exception as e: self.log(LogLevel.ERROR, f"Screenshot 1 failed: {e}", task.id)
-
-                        self.log(LogLevel.WARN, f"Pre-emptive login failed: {e}", task.id)
-
-                # 5. Find Slots
+                # 4. Pre-emptive Login (no-op when the cached session is still valid)
+                steps.start("login")
+                await self.login(page, user, target_url, task)
+
+                # 5. The slot page should offer "Book now"; if not, pick the slot from the listing as before
+                steps.start("slot_wait")
+                target_slot = None
                 try:
-                    page.wait_for_selector("a[href*='/slot/']", timeout=10000)
+                    await page.get_by_role("button", name="Book now").wait_for(timeout=10000)
                 except TimeoutError:
-                    self.log(LogLevel.INFO, "Timeout waiting for slots (or none visible).", task.id)
-                    self.update_task_last_checked(task)
-                    return
-
-                # Get all slots
-                slots = page.locator("a[href*='/slot/']").all()
-                if not slots:
-                    self.log(LogLevel.INFO, "No booking slots found.", task.id)
-                    
-                    try: page.screenshot(path=f"/app/screenshots/step2_slots_not_found_{task.id}.png", full_page=True)
-                    except Exception as e: self.log(LogLevel.ERROR, f"Screenshot 2 failed: {e}", task.id)
-                    
-                    self.update_task_last_checked(task)
-                    return
-                
-                try: page.screenshot(path=f"/app/screenshots/step2_slots_found_{task.id}.png", full_page=True)
-                except Exception as e: self.log(LogLevel.ERROR, f"Screenshot 2 failed: {e}", task.id)
-                
-                # Filter Slots based on Preference
-                target_slot = None
-                if task.target_time_start:
-                    self.log(LogLevel.INFO, f"Looking for slot starting at {task.target_time_start}...", task.id)
-                    target_time_str = f"/slot/{task.target_time_start}"
-                    for s in slots:
-                        href = s.get_attribute("href")
-                        if href and target_time_str in href:
-                            target_slot = s
-                            break
-                    if not target_slot:
-                        self.log(LogLevel.INFO, f"No slot found matching time {task.target_time_start}.", task.id)
-                        
-                        try: page.screenshot(path=f"/app/screenshots/step2_slots_not_found_{task.id}.png", full_page=True)
-                        except Exception as e: self.log(LogLevel.ERROR, f"Screenshot 2 failed: {e}", task.id)
-                        
+                    self.log(LogLevel.INFO, f"Slot page did not offer 'Book now', trying the listing at {url}.", task.id)
+                    await page.goto(url)
+                    target_slot = page.locator(slot_selector(target.href)).first
+                    try:
+                        await target_slot.wait_for(timeout=10000)
+                    except TimeoutError:
+                        self.log(LogLevel.INFO, f"Slot {target.key} is no longer listed.", task.id)
                         self.update_task_last_checked(task)
                         return
-                else:
-                    target_slot = slots[0]
 
-                # Click Slot
-                self.log(LogLevel.INFO, "Clicking slot...", task.id)
-                target_slot.click()
-                
-                # 6. "Your Selection" Modal & Booking
-                try:
-                    # Court Selection Logic
-                    book_btn = page.get_by_role("button", name="Book now")
-                    
-                    # Logic to switch court if full/disabled
-                    def handle_full_court():
-                        # Wait a moment for button state to settle
-                        time.sleep(1)
-                        if book_btn.is_disabled() or page.get_by_text("The session being booked is already full").is_visible():
-                            self.log(LogLevel.INFO, "Default court full. Attempting to switch...", task.id)
-                            # Find "FULL" text to click
-                            full_text = page.get_by_text("FULL -", exact=False).first
-                            if full_text.is_visible():
-                                full_text.click()
-                                try:
-                                    # Select the last option
-                                    page.get_by_role("listbox").get_by_role("option").last.click()
-                                    self.log(LogLevel.INFO, "Switched court.", task.id)
-                                    try: page.screenshot(path=f"/app/screenshots/step2_handling_full_court_{task.id}.png", full_page=True)
-                                    except Exception as e: self.log(LogLevel.ERROR, f"Screenshot switch failed: {e}", task.id)
-                                    time.sleep(1)
-                                except:
-                                    self.log(LogLevel.ERROR, "Failed to select alternative court.", task.id)
-
-                    handle_full_court()
-                    book_btn.click()
-                except TimeoutError:
-                    self.log(LogLevel.ERROR, "Could not click 'Book now' (maybe disabled/court selection needed?)", task.id)
-                    return
-
-                # 7. Login Fallback (If pre-emptive failed)
-                if page.get_by_label("Email address or customer ID").is_visible():
-                    self.log(LogLevel.INFO, "Logging in (fallback)...", task.id)
-                    page.get_by_label("Email address or customer ID").fill(user.email)
-                    pwd = decrypt_value(user.password_encrypted)
-                    page.get_by_label("Password", exact=True).fill(pwd)
-                    page.get_by_role("button", name="Log in").click()
-                    
-                    try:
-                        # Re-check after login
-                        book_btn = page.get_by_role("button", name="Book now")
-                        try: page.screenshot(path=f"/app/screenshots/step1_login_fallback_success_{task.id}.png", full_page=True)
-                        except: pass
+                await self.book_slot(page, task, user, payment, target_slot, steps)
+            except Exception as e:
+                self.log(LogLevel.ERROR, f"Unexpected error in bot run: {e}", task.id)
+                await self.artifacts.screenshot(page, f"error_unexpected_{task.id}", failure=True)
+                # Don't hand a possibly wedged context to the next task
+                lease.failed = True
+            finally:
+                steps.finish()
+                await self.save_video(page, f"task_{task.id}", task.id)
+
+    async def login(self, page, user, url, task):
+        # Check for main "Log in" button (header)
+        # Use test_id to avoid matching other login buttons (e.g. empty basket)
+        login_btn = page.get_by_test_id("login")
+        if await login_btn.is_visible():
+            if self.sessions.get(user.id):
+                self.log(LogLevel.INFO, f"Cached session for {user.name} has expired.", task.id)
+            self.log(LogLevel.INFO, "Performing pre-emptive login...", task.id)
+            try:
+                await login_btn.click()
+                # Wait for login form
+                await page.wait_for_selector("input[id='password']", timeout=10000)
+
+                await page.get_by_label("Email address or customer ID").fill(user.email)
+                pwd = self.secrets.get(user.password_encrypted)
+                await page.get_by_label("Password", exact=True).fill(pwd)
+                await page.get_by_role("button", name="Log in").click()
+
+                # Wait for redirect back
+                await page.wait_for_url(url, timeout=30000)
+                self.log(LogLevel.INFO, "Login successful, returned to availability page.", task.id)
+                # Persist the fresh session so the next context starts logged in
+                await self.sessions.capture(page.context, user.id)
+                await self.artifacts.screenshot(page, f"step1_login_success_{task.id}")
+                return True
+            except Exception as e:
+                await self.artifacts.screenshot(page, f"step1_login_failed_{task.id}", failure=True)
 
-                        handle_full_court()
-                        book_btn.click(timeout=10000)
-                    except:
-                        pass 
+                self.log(LogLevel.WARN, f"Pre-emptive login failed: {e}", task.id)
+                return False
+        return True
 
-                # 8. Checkout / Basket
-                try:
-                    page.wait_for_url("**/checkout", timeout=15000)
-                except:
-                    self.log(LogLevel.ERROR, "Failed to reach checkout page.", task.id)
-                    return
-
-                self.log(LogLevel.INFO, "At Checkout. Filling billing details...", task.id)
-                
-                # 9. Fill Billing Details
-                try:
-                    # Robustly check 'Pay with a different card'
-                    saved_card = page.get_by_label("Pay with saved card")
-                    if saved_card.is_visible() and saved_card.is_checked():
-                        page.get_by_label("Pay with a different card").check()
-                    elif not saved_card.is_visible():
-                        diff_card = page.get_by_label("Pay with a different card")
-                        if diff_card.is_visible():
-                            diff_card.check()
-                except Exception as e:
-                    self.log(LogLevel.ERROR, f"Error selecting payment method: {e}", task.id)
-                    try: page.screenshot(path=f"/app/screenshots/error_checkout_{task.id}.png", full_page=True)
-                    except: pass
-                    return 
-                
-                try:
-                    page.get_by_label("First name").fill(payment.cardholder_name.split()[0]) 
-                    page.get_by_label("Last name").fill(payment.cardholder_name.split()[-1] if len(payment.cardholder_name.split()) > 1 else "")
-                    
-                    # Address Line 1 often lacks a proper label association
-                    try:
-                        page.get_by_label("Address line 1").fill(payment.address_line_1)
-                    except:
-                        # Fallback: Find input near text
-                        page.locator("div").filter(has_text="Address line 1").last.locator("input").first.fill(payment.address_line_1)
+    async def book_slot(self, page, task, user, payment, target_slot, steps):
+        # target_slot: the link to click on a listing page, or None when the page is already the slot's own
+        steps.start("court_selection")
+        if target_slot is not None:
+            self.log(LogLevel.INFO, "Clicking slot...", task.id)
+            await target_slot.click()
 
-                    page.get_by_label("Town/city").fill(payment.city)
-                    page.get_by_label("Postcode").fill(payment.postcode)
-                except Exception as e:
-                    self.log(LogLevel.WARN, f"Error filling billing address: {e}", task.id)
-                    try: page.screenshot(path=f"/app/screenshots/error_billing_{task.id}.png", full_page=True)
-                    except: pass
+        # 6. "Your Selection" Modal & Booking
+        try:
+            # Court Selection Logic
+            book_btn = page.get_by_role("button", name="Book now")
 
-                # 10. Opayo Iframe (Card Details)
-                self.log(LogLevel.INFO, "Filling Card Details...", task.id)
-                
-                try:
-                    # Wait for iframe element and get content frame
-                    iframe_el = page.wait_for_selector("iframe[src*='opayo']", timeout=20000)
-                    iframe_el.scroll_into_view_if_needed()
-                    frame = iframe_el.content_frame()
-                    if not frame:
-                        # Sometimes content_frame is null if cross-origin isn't ready? 
-                        # Try finding by url again as fallback
-                        time.sleep(2)
-                        for f in page.frames:
-                            if "opayo" in f.url:
-                                frame = f
-                                break
-                    
-                    if not frame:
-                        raise Exception("Could not find Opayo iframe content")
-
-                    # Use placeholders as fallback if names fail
-                    try:
-                        frame.get_by_placeholder("Cardholder Name").press_sequentially(payment.cardholder_name, delay=100)
-                    except:
-                        frame.locator("input[name='cardholderName']").press_sequentially(payment.cardholder_name, delay=100)
+            full_msg = page.get_by_text("The session being booked is already full")
 
-                    cn = decrypt_value(payment.card_number_encrypted)
+            # Logic to switch court if full/disabled
+            async def handle_full_court():
+                # Wait for button state to settle
+                if self.fast_checkout:
                     try:
-                        frame.get_by_placeholder("0000 0000 0000 0000").press_sequentially(cn, delay=100)
-                    except:
-                         frame.locator("input[name='cardNumber']").press_sequentially(cn, delay=100)
+                        await book_btn.or_(full_msg).first.wait_for(timeout=5000)
+                    except TimeoutError:
+                        pass
+                else:
+                    await asyncio.sleep(1)
+                if await book_btn.is_disabled() or await full_msg.is_visible():
+                    self.log(LogLevel.INFO, "Default court full. Attempting to switch...", task.id)
+                    # Find "FULL" text to click
+                    full_text = page.get_by_text("FULL -", exact=False).first
+                    if await full_text.is_visible():
+                        await full_text.click()
+                        try:
+                            # Select the last option
+                            await page.get_by_role("listbox").get_by_role("option").last.click()
+                            self.log(LogLevel.INFO, "Switched court.", task.id)
+                            await self.artifacts.screenshot(page, f"step2_handling_full_court_{task.id}")
+                            if self.fast_checkout:
+                                try:
+                                    await expect(book_btn).to_be_enabled(timeout=5000)
+                                except AssertionError:
+                                    pass
+                            else:
+                                await asyncio.sleep(1)
+                        except:
+                            self.log(LogLevel.ERROR, "Failed to select alternative court.", task.id)
 
-                    exp = f"{payment.expiry_month}{payment.expiry_year}"
-                    try:
-                        frame.get_by_placeholder("MMYY").press_sequentially(exp, delay=100)
-                    except:
-                        frame.locator("input[name='expiryDate']").press_sequentially(exp, delay=100)
+            await handle_full_court()
+            await book_btn.click()
+        except TimeoutError:
+            self.log(LogLevel.ERROR, "Could not click 'Book now' (maybe disabled/court selection needed?)", task.id)
+            return
 
-                    cvv = decrypt_value(payment.cvv_encrypted)
-                    try:
-                        frame.get_by_placeholder("123").press_sequentially(cvv, delay=100)
-                    except:
-                        frame.locator("input[name='securityCode']").press_sequentially(cvv, delay=100)
-                        
-                    try: page.screenshot(path=f"/app/screenshots/step3_details_filled_{task.id}.png", full_page=True)
-                    except: pass
+        # 7. Login Fallback (If pre-emptive failed)
+        steps.start("login_fallback")
+        if await page.get_by_label("Email address or customer ID").is_visible():
+            self.log(LogLevel.INFO, "Logging in (fallback)...", task.id)
+            await page.get_by_label("Email address or customer ID").fill(user.email)
+            pwd = self.secrets.get(user.password_encrypted)
+            await page.get_by_label("Password", exact=True).fill(pwd)
+            await page.get_by_role("button", name="Log in").click()
 
-                except Exception as e:
-                    self.log(LogLevel.ERROR, f"Error filling Iframe: {e}", task.id)
-                    try: page.screenshot(path=f"/app/screenshots/error_iframe_{task.id}.png", full_page=True)
-                    except: pass
-                    return
-
-                # 11. Finalize
-                self.log(LogLevel.INFO, "Finalizing...", task.id)
-                page.get_by_label("I agree to the Terms and Conditions").check()
-                
-                pay_btn = page.get_by_role("button", name="Pay now")
-                
-                if pay_btn.is_disabled():
-                    page.mouse.click(0, 0)
-                    time.sleep(1)
-                
-                if pay_btn.is_disabled():
-                    self.log(LogLevel.ERROR, "Pay Now button is still disabled after filling.", task.id)
-                    return
-
-                time.sleep(1)
-                try: page.screenshot(path=f"/app/screenshots/step4_before_pay_{task.id}.png", full_page=True)
-                except: pass
-
-                pay_btn.click()
-                
-                # 12. Confirmation
-                try:
-                    page.wait_for_url("**/confirmation", timeout=30000)
-                    ref = "CONFIRMED" 
-                    
-                    bookings.insert(Booking(
-                        task_id=task.id,
-                        reference_number=ref,
-                        court_name="Auto-Assigned",
-                        price="Unknown"
-                    ))
-                    
-                    self.update_task_status(task, TaskStatus.SUCCESS)
-                    self.log(LogLevel.INFO, "Booking Successful!", task.id)
-                    try: page.screenshot(path=f"/app/screenshots/step5_confirmation_{task.id}.png", full_page=True)
-                    except: pass
-                    
-                except TimeoutError:
-                    self.log(LogLevel.ERROR, "Timeout waiting for confirmation.", task.id)
-                    try: page.screenshot(path=f"/app/screenshots/error_confirmation_timeout_{task.id}.png", full_page=True)
-                    except Exception as e: self.log(LogLevel.ERROR, f"Screenshot confirmation timeout failed: {e}", task.id)
-            
-            except Exception as e:
-                self.log(LogLevel.ERROR, f"Unexpected error in bot run: {e}", task.id)
-            finally:
+            try:
+                # Re-check after login
+                book_btn = page.get_by_role("button", name="Book now")
+                await self.artifacts.screenshot(page, f"step1_login_fallback_success_{task.id}")
+
+                await handle_full_court()
+                await book_btn.click(timeout=10000)
+            except:
+                pass 
+
+        # 8. Checkout / Basket
+        steps.start("checkout")
+        try:
+            await page.wait_for_url("**/checkout", timeout=15000)
+        except:
+            self.log(LogLevel.ERROR, "Failed to reach checkout page.", task.id)
+            return
+
+        self.log(LogLevel.INFO, "At Checkout. Filling billing details...", task.id)
+
+        # 9. Fill Billing Details
+        steps.start("billing")
+        try:
+            # Robustly check 'Pay with a different card'
+            saved_card = page.get_by_label("Pay with saved card")
+            if await saved_card.is_visible() and await saved_card.is_checked():
+                await page.get_by_label("Pay with a different card").check()
+            elif not await saved_card.is_visible():
+                diff_card = page.get_by_label("Pay with a different card")
+                if await diff_card.is_visible():
+                    await diff_card.check()
+        except Exception as e:
+            self.log(LogLevel.ERROR, f"Error selecting payment method: {e}", task.id)
+            await self.artifacts.screenshot(page, f"error_checkout_{task.id}", failure=True)
+            return 
+
+        try:
+            await page.get_by_label("First name").fill(payment.cardholder_name.split()[0]) 
+            await page.get_by_label("Last name").fill(payment.cardholder_name.split()[-1] if len(payment.cardholder_name.split()) > 1 else "")
+
+            # Address Line 1 often lacks a proper label association
+            try:
+                await page.get_by_label("Address line 1").fill(payment.address_line_1)
+            except:
+                # Fallback: Find input near text
+                await page.locator("div").filter(has_text="Address line 1").last.locator("input").first.fill(payment.address_line_1)
+
+            await page.get_by_label("Town/city").fill(payment.city)
+            await page.get_by_label("Postcode").fill(payment.postcode)
+        except Exception as e:
+            self.log(LogLevel.WARN, f"Error filling billing address: {e}", task.id)
+            await self.artifacts.screenshot(page, f"error_billing_{task.id}", failure=True)
+
+        # 10. Opayo Iframe (Card Details)
+        steps.start("card_iframe")
+        self.log(LogLevel.INFO, "Filling Card Details...", task.id)
+
+        try:
+            # Wait for iframe element and get content frame
+            iframe_el = await page.wait_for_selector("iframe[src*='opayo']", timeout=20000)
+            await iframe_el.scroll_into_view_if_needed()
+            if self.fast_checkout:
+                # Auto-waits for the frame and each field; no content_frame() polling
+                frame = page.frame_locator("iframe[src*='opayo']")
+            else:
+                frame = await iframe_el.content_frame()
+            if not frame:
+                # Sometimes content_frame is null if cross-origin isn't ready? 
+                # Try finding by url again as fallback
+                await asyncio.sleep(2)
+                for f in page.frames:
+                    if "opayo" in f.url:
+                        frame = f
+                        break
+
+            if not frame:
+                raise Exception("Could not find Opayo iframe content")
+
+            await self.enter_card_field(frame, "Cardholder Name", "cardholderName", payment.cardholder_name)
+            await self.enter_card_field(frame, "0000 0000 0000 0000", "cardNumber", self.secrets.get(payment.card_number_encrypted))
+            await self.enter_card_field(frame, "MMYY", "expiryDate", f"{payment.expiry_month}{payment.expiry_year}")
+            await self.enter_card_field(frame, "123", "securityCode", self.secrets.get(payment.cvv_encrypted))
+
+            await self.artifacts.screenshot(page, f"step3_details_filled_{task.id}")
+
+        except Exception as e:
+            self.log(LogLevel.ERROR, f"Error filling Iframe: {e}", task.id)
+            await self.artifacts.screenshot(page, f"error_iframe_{task.id}", failure=True)
+            return
+
+        # 11. Finalize
+        steps.start("finalize")
+        self.log(LogLevel.INFO, "Finalizing...", task.id)
+        await page.get_by_label("I agree to the Terms and Conditions").check()
+
+        pay_btn = page.get_by_role("button", name="Pay now")
+
+        if await pay_btn.is_disabled():
+            # Blur the last field so the iframe validates
+            await page.mouse.click(0, 0)
+            if self.fast_checkout:
                 try:
-                    page.close()
-                    context.close()
-                    # Rename video
-                    video_path = page.video.path()
-                    if video_path:
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        new_path = f"/app/videos/task_{task.id}_{timestamp}.webm"
-                        os.rename(video_path, new_path)
-                        self.log(LogLevel.INFO, f"Video saved to {new_path}", task.id)
-                except Exception as e:
-                    self.log(LogLevel.WARN, f"Failed to save video: {e}", task.id)
+                    await expect(pay_btn).to_be_enabled(timeout=3000)
+                except AssertionError:
+                    pass
+            else:
+                await asyncio.sleep(1)
+
+        if await pay_btn.is_disabled():
+            self.log(LogLevel.ERROR, "Pay Now button is still disabled after filling.", task.id)
+            return
+
+        if not self.fast_checkout:
+            await asyncio.sleep(1)
+        await self.artifacts.screenshot(page, f"step4_before_pay_{task.id}")
+
+        # Multi-target tasks: only the first sibling to get this far pays
+        if not claim_group_win(task):
+            self.log(LogLevel.INFO, f"Another target in group {task.group_id} is already paying; stopping this one.", task.id)
+            self.update_task_status(task, TaskStatus.STOPPED)
+            return
+
+        await pay_btn.click()
+
+        # 12. Confirmation
+        steps.start("confirmation")
+        try:
+            await page.wait_for_url("**/confirmation", timeout=30000)
+            ref = "CONFIRMED" 
+
+            bookings.insert(Booking(
+                task_id=task.id,
+                reference_number=ref,
+                court_name="Auto-Assigned",
+                price="Unknown"
+            ))
+
+            self.update_task_status(task, TaskStatus.SUCCESS)
+            self.log(LogLevel.INFO, "Booking Successful!", task.id)
+            stopped = stop_siblings(task)
+            if stopped:
+                self.log(LogLevel.INFO, f"Stopped sibling task(s) {', '.join(map(str, stopped))} in group {task.group_id}.", task.id)
+            await self.artifacts.screenshot(page, f"step5_confirmation_{task.id}")
+
+        except TimeoutError:
+            self.log(LogLevel.ERROR, "Timeout waiting for confirmation.", task.id)
+            await self.artifacts.screenshot(page, f"error_confirmation_timeout_{task.id}", failure=True)
+            # The card may have been charged: end the task (and its group) rather than let a retry or sibling pay again
+            self.update_task_status(task, TaskStatus.FAILED)
+            stopped = stop_siblings(task)
+            self.log(LogLevel.ERROR, f"Payment outcome unknown; task marked FAILED{f' and {len(stopped)} sibling task(s) stopped' if task.group_id else ''}.", task.id)
+
+
+    async def enter_card_field(self, frame, placeholder, name, value):
+        # Placeholder first, input name as the fallback
+        field = frame.get_by_placeholder(placeholder).or_(frame.locator(f"input[name='{name}']")).first
+        if not self.fast_checkout:
+            await field.press_sequentially(value, delay=100)
+            return
+        # One fill() event; if the field's formatter rejected it, retype without per-key delay
+        await field.fill(value)
+        if re.sub(r"[\s/]", "", await field.input_value()) != re.sub(r"[\s/]", "", value):
+            await field.fill("")
+            await field.press_sequentially(value)
 
     def update_task_status(self, task, status):
         task.status = status.value
         tasks.update(task)
 
-    def update_task_last_checked(self, task):
+    def update_task_last_checked(self, task, retry_after=None):
         task.last_checked_at = datetime.now()
-        tasks.update(task)
-
-def run_worker():
-    bot = BookingBot(headless=True)
-    print("Worker started. Polling for tasks...")
-    while True:
+        # Schedule the next check; a task whose slot time has passed is expired instead
+        action, task.next_check_at = plan_check(task, task.last_checked_at)
+        if action == EXPIRE:
+            task.status = TaskStatus.EXPIRED.value
+        elif retry_after:
+            task.next_check_at = max(task.next_check_at, task.last_checked_at + timedelta(seconds=retry_after))
+        # Only while still active: a task stopped meanwhile (by the user or a sibling's booking) stays stopped
         try:
-            pending_tasks = tasks(where="status IN ('PENDING', 'RUNNING')")
-            for t in pending_tasks:
-                should_run = False
-                if t.status == TaskStatus.PENDING.value:
-                    should_run = True
-                elif t.status == TaskStatus.RUNNING.value:
-                    last_check = t.last_checked_at
-                    if isinstance(last_check, str):
-                        try:
-                            last_check = datetime.fromisoformat(last_check)
-                        except:
-                            last_check = None
-
-                    if last_check and (datetime.now() - last_check).total_seconds() > 300:
-                        should_run = True
-                    elif not last_check:
-                        should_run = True
-                
-                if should_run:
+            db.execute(text("""
+                UPDATE task SET last_checked_at = :checked, next_check_at = :next_check, status = :status
+                WHERE id = :id AND status IN ('PENDING', 'RUNNING')
+            """), {"checked": task.last_checked_at, "next_check": task.next_check_at, "status": task.status, "id": task.id})
+            db.conn.commit()
+        except Exception:
+            db.conn.rollback()
+            raise
+
+POOL_STATS_INTERVAL = 300
+POLL_INTERVAL = 10
+# With LISTEN/NOTIFY the worker wakes on task changes; this is only the safety net
+FALLBACK_POLL_INTERVAL = int(os.getenv("WORKER_FALLBACK_POLL_SECONDS", "60"))
+
+def active_tasks():
+    return tasks(where="status IN ('PENDING', 'RUNNING')")
+
+async def process_group(bot, url, group):
+    with bot.metrics.span(CHECK_SECONDS):
+        slots = await bot.check_availability(url, group)
+    bot.metrics.count(CHECKS_PER_MINUTE, len(group))
+    if slots is None:
+        # Failed or timed-out check: reschedule, and keep it out of the availability history
+        for t in group:
+            bot.update_task_last_checked(t)
+        return
+    await asyncio.gather(*(bot.run_task(t, slots=slots) for t in group))
+    # After booking, so the history write never delays a checkout
+    try:
+        appeared, gone = record_observation(group[0], slots)
+        if appeared or gone:
+            bot.log(LogLevel.INFO, f"Availability changed at {url}: +{len(appeared)} / -{len(gone)} slot(s).")
+    except Exception as e:
+        print(f"Failed to record availability history: {e}")
+
+async def worker_loop(mode="sequential", concurrency=1, bot=None):
+    if mode == "sequential":
+        concurrency = 1
+    # A caller-supplied bot (benchmark.py) brings its own pool and probe; the loop still owns shutdown
+    if bot is None:
+        probe = HttpProbe() if PROBE_MODE == "http" else None
+        bot = BookingBot(headless=True, pool=BrowserPool(headless=True, size=max(POOL_SIZE, concurrency)), concurrency=concurrency, probe=probe)
+    pool, probe = bot.pool, bot.probe
+    await pool.start()
+    sniper = Sniper(bot)
+    queue = TaskQueue()
+    print(f"Worker {queue.worker_id} started ({mode}, concurrency {concurrency}, {PROBE_MODE} probe). Polling for tasks...")
+
+    # Task ids with a check or booking still in flight; skipped until it finishes
+    in_flight = set()
+    jobs = {asyncio.create_task(bot.sessions.refresh_loop(bot, active_tasks)),
+            asyncio.create_task(queue.heartbeat(lambda: in_flight | sniper.active)),
+            asyncio.create_task(bot.secrets.purge_loop())}
+    listener = TaskListener(db)
+    last_stats = time.monotonic()
+    last_sample = 0
+    try:
+        while True:
+            cycle_started = time.monotonic()
+            try:
+                if not listener.active:
+                    listener.start()
+
+                if time.monotonic() - last_stats > POOL_STATS_INTERVAL:
+                    logger.info(pool.report())
+                    last_stats = time.monotonic()
+
+                # Claim due tasks (via the partial due index) and decide what each one needs
+                groups = {}
+                for t in queue.claim_due():
+                    if t.id in in_flight or t.id in sniper.active:
+                        continue
+                    action, next_check = plan_check(t)
+                    if action == EXPIRE:
+                        bot.log(LogLevel.INFO, f"Task {t.id} expired: {t.target_date} {t.target_time_start or ''} has passed.", t.id)
+                        bot.update_task_status(t, TaskStatus.EXPIRED)
+                        queue.release([t.id])
+                        continue
+
+                    # Tasks about to enter the booking window get a parked release-window session
+                    if in_snipe_window(t):
+                        job = sniper.start(t)
+                        job.add_done_callback(lambda _, ids=[t.id]: queue.release(ids))
+                        job.add_done_callback(jobs.discard)
+                        jobs.add(job)
+                        continue
+
+                    if action == PARK:
+                        # Not bookable yet; come back when the sniper window opens
+                        t.next_check_at = next_check
+                        tasks.update(t)
+                        queue.release([t.id])
+                        continue
+
                     if t.status == TaskStatus.PENDING.value:
                         bot.update_task_status(t, TaskStatus.RUNNING)
-                    
-                    bot.run_task(t)
-            
-            time.sleep(10)
-            
+                    groups.setdefault(availability_url(t), []).append(t)
+
+                for url, group in groups.items():
+                    ids = {t.id for t in group}
+                    if mode == "sequential":
+                        in_flight.update(ids)
+                        try:
+                            await process_group(bot, url, group)
+                        finally:
+                            in_flight.difference_update(ids)
+                            queue.release(ids)
+                        continue
+                    in_flight.update(ids)
+                    job = asyncio.create_task(process_group(bot, url, group))
+                    job.add_done_callback(lambda _, ids=ids: in_flight.difference_update(ids))
+                    job.add_done_callback(lambda _, ids=ids: queue.release(ids))
+                    job.add_done_callback(jobs.discard)
+                    job.add_done_callback(lambda _: listener.wake())
+                    jobs.add(job)
+
+                bot.metrics.observe(CYCLE_SECONDS, time.monotonic() - cycle_started)
+                if time.monotonic() - last_sample > METRICS_INTERVAL:
+                    bot.metrics.observe(QUEUE_DEPTH, queue.depth())
+                    bot.metrics.observe(CHECKS_PER_MINUTE, bot.metrics.per_minute(CHECKS_PER_MINUTE))
+                    bot.metrics.prune()
+                    last_sample = time.monotonic()
+
+                # Block until notified, the next task falls due, or the fallback poll
+                fallback = FALLBACK_POLL_INTERVAL if listener.active else POLL_INTERVAL
+                next_due = queue.seconds_until_next_due()
+                await listener.wait(fallback if next_due is None else min(fallback, max(next_due, 1)))
+
+            except Exception as e:
+                print(f"Worker Loop Error: {e}")
+                await asyncio.sleep(POLL_INTERVAL)
+            finally:
+                # Claimed this cycle but never handed to a job (the cycle raised part way): give them back now
+                stranded = [i for i in queue.held if i not in in_flight and i not in sniper.active]
+                try:
+                    queue.release(stranded)
+                except Exception as e:
+                    print(f"Failed to release leases: {e}")
+    finally:
+        listener.close()
+        for job in jobs:
+            job.cancel()
+        await asyncio.gather(*jobs, return_exceptions=True)
+        # Hand unfinished tasks straight back rather than waiting for the lease to lapse
+        try:
+            queue.release_all()
         except Exception as e:
-            print(f"Worker Loop Error: {e}")
-            time.sleep(10)
+            print(f"Failed to release leases: {e}")
+        logger.info(pool.report())
+        bot.log_sink.close()
+        bot.metrics.close()
+        bot.artifacts.close()
+        bot.secrets.clear()
+        await pool.close()
+        if probe:
+            await probe.close()
+
+def run_worker(mode="sequential", concurrency=1):
+    require_schema("Worker")
+    try:
+        asyncio.run(worker_loop(mode, concurrency))
+    except KeyboardInterrupt:
+        pass
 
 if __name__ == "__main__":
-    run_worker()
+    parser = argparse.ArgumentParser(description="Better Booking worker")
+    parser.add_argument("--mode", choices=["sequential", "async"], default=os.getenv("WORKER_MODE", "sequential"),
+                        help="sequential: one check/booking at a time; async: run them concurrently")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("WORKER_CONCURRENCY", "4")),
+                        help="max concurrent checks/bookings in async mode")
+    args = parser.parse_args()
+    run_worker(args.mode, args.concurrency)
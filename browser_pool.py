@@ -0,0 +1,241 @@
+import os
+import time
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright
+from playwright_stealth import Stealth
+from artifacts import VIDEO_DIR, VIDEO_ENABLED
+
+logger = logging.getLogger("BrowserPool")
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# Pool tuning (env overridable)
+POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+POOL_MAX_USES = int(os.getenv("BROWSER_POOL_MAX_USES", "20"))
+
+# Two tiers of context. Pooled check contexts are anonymous, unrecorded and small; booking contexts
+# (full viewport, video when enabled, the account's session) are only built once a slot matches.
+BOOKING_VIEWPORT = {"width": 1280, "height": 1440}
+CHECK_VIEWPORT = {"width": int(os.getenv("CHECK_VIEWPORT_WIDTH", "1024")), "height": int(os.getenv("CHECK_VIEWPORT_HEIGHT", "768"))}
+# Stealth stays on for checks too: anonymous polling is what bot detection sees most of. 0 turns it off.
+CHECK_STEALTH = os.getenv("CHECK_STEALTH", "1") == "1"
+
+# Check-phase resource policy: what a slot-list page load may skip (env overridable, comma separated).
+# The cookie banner is left alone: without it accept_cookies() would sit out its timeout.
+BLOCKED_RESOURCE_TYPES = set(filter(None, os.getenv("CHECK_BLOCK_RESOURCE_TYPES", "image,media,font").split(",")))
+BLOCKED_DOMAINS = tuple(filter(None, os.getenv(
+    "CHECK_BLOCK_DOMAINS",
+    "google-analytics.com,googletagmanager.com,doubleclick.net,facebook.net,facebook.com,hotjar.com,clarity.ms,"
+    "bing.com,tiktok.com,linkedin.com,twitter.com,youtube.com"
+).split(",")))
+
+def is_blocked(resource_type, url):
+    if resource_type in BLOCKED_RESOURCE_TYPES:
+        return True
+    host = url.split("://", 1)[-1].split("/", 1)[0].split(":", 1)[0]
+    return any(host == d or host.endswith("." + d) for d in BLOCKED_DOMAINS)
+
+class PooledContext:
+    def __init__(self, context):
+        self.context = context
+        self.uses = 0
+        self.broken = False
+        context.on("close", lambda _: self.mark_broken())
+
+    def mark_broken(self):
+        self.broken = True
+
+class Lease:
+    def __init__(self, pooled, page, dedicated=False):
+        self.pooled = pooled
+        self.page = page
+        self.failed = False
+        # Booking contexts are built for one task and closed afterwards, never handed to another
+        self.dedicated = dedicated
+        page.on("crash", lambda _: pooled.mark_broken())
+
+    @property
+    def context(self):
+        return self.pooled.context
+
+class BrowserPool:
+    """Long-lived Chromium owned by the worker: warm check contexts from a pool, booking contexts on demand."""
+
+    def __init__(self, headless=True, size=POOL_SIZE, max_uses=POOL_MAX_USES, video_dir=VIDEO_DIR if VIDEO_ENABLED else None):
+        self.headless = headless
+        self.size = size
+        self.max_uses = max_uses
+        self.video_dir = video_dir
+        self._playwright = None
+        self.browser = None
+        self._idle = deque()
+        self.stats = {"hits": 0, "misses": 0, "booking": 0, "recycled": 0, "relaunches": 0, "blocked": 0, "checkout_ms_total": 0.0, "checkout_ms_max": 0.0}
+
+    async def start(self):
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        await self._launch()
+        await self._fill()
+
+    async def _launch(self):
+        self.browser = await self._playwright.chromium.launch(
+            headless=self.headless,
+            args=["--disable-blink-features=AutomationControlled"]
+        )
+
+    async def _ensure_browser(self):
+        if self.browser is None:
+            await self.start()
+        elif not self.browser.is_connected():
+            logger.warning("Browser disconnected, relaunching.")
+            self.stats["relaunches"] += 1
+            self._idle.clear()
+            await self._launch()
+
+    async def _new_context(self):
+        # Check tier: no session, no video; stealth unless CHECK_STEALTH=0
+        context = await self.browser.new_context(user_agent=USER_AGENT, viewport=CHECK_VIEWPORT)
+        if CHECK_STEALTH:
+            await Stealth().apply_stealth_async(context)
+        return PooledContext(context)
+
+    async def _new_booking_context(self, storage_state=None):
+        # Video only when ARTIFACT_LEVEL=full; recording costs encoding on every page
+        video = {"record_video_dir": self.video_dir, "record_video_size": BOOKING_VIEWPORT} if self.video_dir else {}
+        # Use realistic User Agent to avoid blocking
+        context = await self.browser.new_context(
+            storage_state=storage_state,
+            user_agent=USER_AGENT,
+            viewport=BOOKING_VIEWPORT,
+            **video
+        )
+        await Stealth().apply_stealth_async(context)
+        return PooledContext(context)
+
+    async def _fill(self):
+        while len(self._idle) < self.size:
+            try:
+                self._idle.append(await self._new_context())
+            except Exception as e:
+                logger.warning(f"Failed to pre-create context: {e}")
+                break
+
+    async def _discard(self, pooled):
+        self.stats["recycled"] += 1
+        try:
+            await pooled.context.close()
+        except Exception:
+            pass
+
+    async def _take_idle(self):
+        while self._idle:
+            candidate = self._idle.popleft()
+            if not candidate.broken:
+                return candidate
+            await self._discard(candidate)
+        return None
+
+    async def _route(self, route):
+        if is_blocked(route.request.resource_type, route.request.url):
+            self.stats["blocked"] += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def block_heavy_resources(self, page):
+        await page.route("**/*", self._route)
+
+    async def allow_all_resources(self, page):
+        # Switching a check page over to booking: load everything from here on
+        await page.unroute("**/*", self._route)
+
+    async def checkout(self, storage_state=None, light=False, booking=False):
+        started = time.perf_counter()
+        await self._ensure_browser()
+        # A restored session is never loaded into a shared context
+        booking = booking or bool(storage_state)
+
+        if booking:
+            # Built for this task only, from the account's cached session when there is one
+            self.stats["booking"] += 1
+            pooled = await self._new_booking_context(storage_state)
+        else:
+            pooled = await self._take_idle()
+            if pooled:
+                self.stats["hits"] += 1
+            else:
+                self.stats["misses"] += 1
+                pooled = await self._new_context()
+
+        page = await pooled.context.new_page()
+        if light:
+            await self.block_heavy_resources(page)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.stats["checkout_ms_total"] += elapsed_ms
+        self.stats["checkout_ms_max"] = max(self.stats["checkout_ms_max"], elapsed_ms)
+        return Lease(pooled, page, dedicated=booking)
+
+    async def checkin(self, lease):
+        pooled = lease.pooled
+        pooled.uses += 1
+
+        if lease.dedicated:
+            try:
+                await pooled.context.close()
+            except Exception:
+                pass
+            return
+
+        if not pooled.broken and not lease.failed:
+            # Drop session state so the next task starts clean
+            try:
+                await pooled.context.clear_cookies()
+            except Exception:
+                pooled.mark_broken()
+
+        if lease.failed or pooled.broken or pooled.uses >= self.max_uses or len(self._idle) >= self.size:
+            await self._discard(pooled)
+        else:
+            self._idle.append(pooled)
+
+        # Top up between tasks, off the critical path of the next checkout
+        if self.browser and self.browser.is_connected():
+            await self._fill()
+
+    @asynccontextmanager
+    async def lease(self, storage_state=None, light=False, booking=False):
+        # booking=True: a heavyweight context for login and checkout; otherwise a pooled anonymous check context
+        # light=True: the page only needs the slot list, so images/fonts/trackers are aborted
+        lease = await self.checkout(storage_state, light, booking)
+        try:
+            yield lease
+        except Exception:
+            lease.failed = True
+            raise
+        finally:
+            await self.checkin(lease)
+
+    def report(self):
+        checkouts = self.stats["hits"] + self.stats["misses"] + self.stats["booking"]
+        avg_ms = self.stats["checkout_ms_total"] / checkouts if checkouts else 0.0
+        return (
+            f"Pool: {self.stats['hits']} hits / {self.stats['misses']} misses, {self.stats['booking']} booking contexts, "
+            f"{self.stats['recycled']} recycled, {self.stats['relaunches']} relaunches, {self.stats['blocked']} requests blocked, "
+            f"checkout avg {avg_ms:.1f}ms max {self.stats['checkout_ms_max']:.1f}ms, "
+            f"{len(self._idle)} idle"
+        )
+
+    async def close(self):
+        while self._idle:
+            await self._discard(self._idle.popleft())
+        try:
+            if self.browser:
+                await self.browser.close()
+        finally:
+            if self._playwright:
+                await self._playwright.stop()
+            self.browser = None
+            self._playwright = None
@@ -0,0 +1,54 @@
+import os
+import time
+import asyncio
+from models import decrypt_value
+
+CREDENTIAL_CACHE_TTL = int(os.getenv("CREDENTIAL_CACHE_TTL_SECONDS", "600"))
+CREDENTIAL_PURGE_INTERVAL = 30
+
+class CredentialCache:
+    """Short-lived cache of decrypted credentials for the worker, keyed by ciphertext.
+
+    Values are held as bytearrays and overwritten with zeros on eviction. The str handed to
+    Playwright is a copy the cache can't scrub, so keep the TTL short.
+    """
+
+    def __init__(self, ttl=CREDENTIAL_CACHE_TTL):
+        self.ttl = ttl
+        self._items = {}  # ciphertext -> (expires_at, bytearray)
+
+    def get(self, encrypted):
+        if not encrypted:
+            return ""
+        self.purge()
+        item = self._items.get(encrypted)
+        if item:
+            return item[1].decode()
+        value = decrypt_value(encrypted)
+        if value:
+            self._items[encrypted] = (time.monotonic() + self.ttl, bytearray(value.encode()))
+        return value
+
+    def warm(self, *encrypted):
+        # Decrypt ahead of time so Fernet work stays off the checkout path
+        for e in encrypted:
+            self.get(e)
+
+    def _evict(self, key):
+        _, buf = self._items.pop(key)
+        buf[:] = bytes(len(buf))
+
+    def purge(self):
+        now = time.monotonic()
+        for key in [k for k, (expires_at, _) in self._items.items() if expires_at <= now]:
+            self._evict(key)
+
+    async def purge_loop(self, interval=CREDENTIAL_PURGE_INTERVAL):
+        # get() only purges when called; an idle worker must still drop expired secrets on time
+        while True:
+            await asyncio.sleep(interval)
+            self.purge()
+
+    def clear(self):
+        for key in list(self._items):
+            self._evict(key)
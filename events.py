@@ -0,0 +1,84 @@
+import asyncio
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from sqlalchemy import text
+
+# Postgres LISTEN/NOTIFY channel the web app uses to wake the worker
+TASK_CHANNEL = "task_events"
+
+def is_postgres(db):
+    return db.engine.dialect.name == "postgresql"
+
+def notify_task_change(db, task_id, action):
+    # Delivered to listeners when the surrounding transaction commits; no-op off Postgres
+    if not is_postgres(db):
+        return
+    try:
+        db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": TASK_CHANNEL, "payload": f"{action}:{task_id}"})
+        db.conn.commit()
+    except Exception as e:
+        db.conn.rollback()
+        print(f"Failed to notify {TASK_CHANNEL}: {e}")
+
+class TaskListener:
+    """Blocks the worker on the task channel so new/cancelled tasks wake it immediately."""
+
+    def __init__(self, db):
+        self.db = db
+        self.conn = None
+        self.event = asyncio.Event()
+
+    @property
+    def active(self):
+        return self.conn is not None
+
+    def start(self):
+        if not is_postgres(self.db):
+            return
+        try:
+            dsn = self.db.engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+            self.conn = psycopg2.connect(dsn)
+            self.conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            with self.conn.cursor() as cur:
+                cur.execute(f"LISTEN {TASK_CHANNEL}")
+            asyncio.get_running_loop().add_reader(self.conn.fileno(), self._on_readable)
+        except Exception as e:
+            print(f"LISTEN {TASK_CHANNEL} unavailable, polling only: {e}")
+            self.close()
+
+    def _on_readable(self):
+        try:
+            self.conn.poll()
+        except Exception as e:
+            # Connection dropped; fall back to polling until the next start()
+            print(f"Task listener lost connection: {e}")
+            self.close()
+            self.wake()
+            return
+        if self.conn.notifies:
+            self.conn.notifies.clear()
+            self.wake()
+
+    def wake(self):
+        self.event.set()
+
+    async def wait(self, timeout):
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self.event.clear()
+
+    def close(self):
+        if self.conn is None:
+            return
+        try:
+            asyncio.get_running_loop().remove_reader(self.conn.fileno())
+        except Exception:
+            pass
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+        self.conn = None
@@ -0,0 +1,29 @@
+from datetime import datetime
+from sqlalchemy import text
+from models import db, observations, SlotObservation
+
+def current_slots(leisure_centre, duration, target_date):
+    # Replay the page's deltas; the last event per slot says whether it is listed
+    rows = db.execute(text("""
+        SELECT slot, appeared FROM slot_observation
+        WHERE leisure_centre = :centre AND duration = :duration AND target_date = :date
+        ORDER BY id
+    """), {"centre": leisure_centre, "duration": duration, "date": str(target_date)}).all()
+    db.conn.commit()
+    listed = {}
+    for slot, appeared in rows:
+        listed[slot] = bool(appeared)
+    return {slot for slot, on in listed.items() if on}
+
+def record_observation(task, slots, now=None):
+    """Store how a page's slot list changed since it was last seen; returns (appeared, gone)."""
+    now = now or datetime.now()
+    seen = {s.key for s in slots}
+    before = current_slots(task.leisure_centre, task.duration, task.target_date)
+    appeared, gone = seen - before, before - seen
+    changes = [SlotObservation(leisure_centre=task.leisure_centre, duration=task.duration, target_date=str(task.target_date),
+                               slot=slot, appeared=slot in appeared, observed_at=now)
+               for slot in sorted(appeared | gone)]
+    if changes:
+        observations.insert_all(changes)
+    return appeared, gone
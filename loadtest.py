@@ -0,0 +1,118 @@
+# Load driver for the web routes: p50/p99 latency and throughput per route, against data from seed_data.py.
+#
+#   python seed_data.py --allow-database --tasks 100000 --logs 5000000 --reset
+#   python loadtest.py --requests 500 --concurrency 8 --json before.json
+#
+# Without --base-url the app is served in-process from main.py on the same DATABASE_URL.
+# The delete route stops random tasks, so re-seed (--reset) before runs you want to compare.
+import time
+import json
+import random
+import asyncio
+import argparse
+import threading
+import httpx
+from sqlalchemy import text
+
+ROUTES = ["home", "home_filtered", "home_older", "settings", "logs", "logs_task", "logs_level", "logs_older", "delete"]
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+def serve_in_process(port):
+    import uvicorn
+    from main import app
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+def id_ranges():
+    from models import db
+    ranges = {t: db.execute(text(f"SELECT MIN(id), MAX(id) FROM {t}")).one() for t in ("task", "system_log")}
+    db.conn.commit()
+    return ranges
+
+def request_for(route, rng, ranges):
+    # (method, path); ids are drawn from the seeded ranges so keyset pages land mid-table
+    lo, hi = ranges["task"]
+    log_lo, log_hi = ranges["system_log"]
+    task_id = rng.randint(lo, hi) if lo else 1
+    log_id = rng.randint(log_lo, log_hi) if log_lo else 1
+    return {
+        "home": ("GET", "/"),
+        "home_filtered": ("GET", f"/?status={rng.choice(['PENDING', 'RUNNING', 'SUCCESS', 'FAILED'])}"),
+        "home_older": ("GET", f"/?before={task_id}"),
+        "settings": ("GET", "/settings"),
+        "logs": ("GET", "/logs"),
+        "logs_task": ("GET", f"/logs?task_id={task_id}"),
+        "logs_level": ("GET", f"/logs?level={rng.choice(['WARN', 'ERROR'])}"),
+        "logs_older": ("GET", f"/logs?before={log_id}"),
+        "delete": ("DELETE", f"/tasks/{task_id}"),
+    }[route]
+
+async def drive(client, route, requests, concurrency, rng, ranges):
+    latencies, errors = [], 0
+    limit = asyncio.Semaphore(concurrency)
+    plan = [request_for(route, rng, ranges) for _ in range(requests)]
+
+    async def one(method, path):
+        nonlocal errors
+        async with limit:
+            started = time.perf_counter()
+            try:
+                res = await client.request(method, path)
+                if res.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(m, p) for m, p in plan))
+    elapsed = time.perf_counter() - started
+    return {"requests": requests, "errors": errors, "rps": requests / elapsed,
+            "p50_ms": percentile(latencies, 0.5) * 1000, "p99_ms": percentile(latencies, 0.99) * 1000, "max_ms": max(latencies) * 1000}
+
+async def run(base_url, routes, requests, concurrency, warmup, random_seed):
+    rng = random.Random(random_seed)
+    ranges = id_ranges()
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0, limits=httpx.Limits(max_connections=concurrency)) as client:
+        for route in routes:
+            if warmup:
+                await drive(client, route, warmup, concurrency, rng, ranges)
+            r = results[route] = await drive(client, route, requests, concurrency, rng, ranges)
+            print(f"{route:<14} p50 {r['p50_ms']:8.1f}ms  p99 {r['p99_ms']:8.1f}ms  max {r['max_ms']:8.1f}ms  "
+                  f"{r['rps']:7.1f} req/s  errors {r['errors']}/{r['requests']}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the web routes")
+    parser.add_argument("--base-url", help="running app to test; default: serve main.py in-process")
+    parser.add_argument("--port", type=int, default=5098)
+    parser.add_argument("--routes", default=",".join(ROUTES), help=f"comma separated, from {', '.join(ROUTES)}")
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=10, help="untimed requests per route first")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    routes = [r.strip() for r in args.routes.split(",") if r.strip()]
+    unknown = set(routes) - set(ROUTES)
+    if unknown:
+        parser.error(f"unknown route(s): {', '.join(sorted(unknown))}")
+
+    server = None if args.base_url else serve_in_process(args.port)
+    try:
+        results = asyncio.run(run(args.base_url or f"http://127.0.0.1:{args.port}", routes, args.requests, args.concurrency, args.warmup, args.seed))
+    finally:
+        if server:
+            server.should_exit = True
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
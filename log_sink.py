@@ -0,0 +1,83 @@
+import os
+import time
+import queue
+import atexit
+import threading
+from enum import Enum
+from dataclasses import asdict
+from sqlalchemy import insert
+from models import db, logs
+
+LOG_FLUSH_SIZE = int(os.getenv("LOG_FLUSH_SIZE", "50"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL_SECONDS", "1.0"))
+LOG_QUEUE_MAX = 10000
+
+def _row(record):
+    row = {k: (v.value if isinstance(v, Enum) else v) for k, v in asdict(record).items()}
+    row.pop("id", None)
+    return row
+
+class LogSink:
+    """Queues records (SystemLog by default) and bulk-inserts them from a background thread."""
+
+    def __init__(self, flush_size=LOG_FLUSH_SIZE, flush_interval=LOG_FLUSH_INTERVAL, table=None):
+        self.table = logs if table is None else table
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=LOG_QUEUE_MAX)
+        self.dropped = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="LogSink", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def write(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # The DB is down or far behind; the console line is still printed
+            self.dropped += 1
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                pass
+            while len(batch) < self.flush_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = self._stop.is_set()
+            if batch and (len(batch) >= self.flush_size or time.monotonic() >= deadline or stopping):
+                self._flush(batch)
+                batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+            if stopping and self.queue.empty() and not batch:
+                return
+
+    def _flush(self, batch):
+        # Own connection: the shared FastSQL connection belongs to the event loop thread
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(insert(self.table.table), [_row(r) for r in batch])
+        except Exception as e:
+            print(f"Failed to write {len(batch)} {self.table.table.name} rows to DB: {e}")
+
+    def close(self, timeout=5.0):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+        if self.dropped:
+            print(f"LogSink dropped {self.dropped} {self.table.table.name} records (queue full).")
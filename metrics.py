@@ -0,0 +1,84 @@
+import os
+import time
+from collections import deque, Counter
+from contextlib import contextmanager
+from models import metrics, Metric, prune_metrics
+from log_sink import LogSink
+from task_queue import WORKER_ID
+
+# How often the worker samples queue depth and throughput
+METRICS_INTERVAL = int(os.getenv("METRICS_INTERVAL_SECONDS", "60"))
+
+STEP_SECONDS = "booking_step_seconds"
+CHECK_SECONDS = "availability_check_seconds"
+CYCLE_SECONDS = "worker_cycle_seconds"
+QUEUE_DEPTH = "worker_queue_depth"
+CHECKS_PER_MINUTE = "worker_tasks_checked_per_minute"
+
+class Steps:
+    """Times consecutive steps of one run: start() closes the open step and opens the next."""
+
+    def __init__(self, recorder, task_id=None):
+        self.recorder = recorder
+        self.task_id = task_id
+        self.step = None
+        self.started = None
+
+    def start(self, step):
+        self.finish()
+        self.step, self.started = step, time.perf_counter()
+
+    def finish(self):
+        if self.step:
+            self.recorder.observe(STEP_SECONDS, time.perf_counter() - self.started, label=self.step, task_id=self.task_id)
+            self.step = None
+
+class Metrics:
+    """Worker-side metric recorder; samples go to the metric table through a buffered sink."""
+
+    def __init__(self, worker_id=WORKER_ID, sink=None):
+        self.worker_id = worker_id
+        self.sink = sink or LogSink(table=metrics)
+        # name -> monotonic timestamps of recent events, for per-minute rates
+        self._events = {}
+        self.totals = Counter()
+
+    def start(self):
+        self.sink.start()
+        return self
+
+    def observe(self, name, value, label=None, task_id=None):
+        self.sink.write(Metric(name=name, value=value, label=label, task_id=task_id, worker_id=self.worker_id))
+
+    def steps(self, task_id=None):
+        return Steps(self, task_id)
+
+    @contextmanager
+    def span(self, name, label=None, task_id=None):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, label, task_id)
+
+    def count(self, name, n=1):
+        self._events.setdefault(name, deque()).extend([time.monotonic()] * n)
+        self.totals[name] += n
+
+    def per_minute(self, name):
+        events = self._events.get(name, deque())
+        cutoff = time.monotonic() - 60
+        while events and events[0] < cutoff:
+            events.popleft()
+        return len(events)
+
+    def prune(self):
+        # Every replica prunes; the DELETE is idempotent and only touches rows past retention
+        try:
+            return prune_metrics()
+        except Exception as e:
+            print(f"Failed to prune metrics: {e}")
+            return 0
+
+    def close(self):
+        self.sink.close()
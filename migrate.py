@@ -1,10 +1,10 @@
-from main import db
-from sqlalchemy import text
+# Bring the database schema up to date. Runs once per deploy (the compose `migrate` service), before web and worker start.
+#
+# Migrations live in migrations/ as NNNN-description.sql or .py (run with the connection string as argv[1]);
+# the applied version is kept in the _meta table, so re-running only applies new files.
+from models import db, MIGRATIONS_DIR, schema_version
 
-try:
-    with db.engine.connect() as conn:
-        conn.execute(text("ALTER TABLE task ADD COLUMN target_time_start TEXT"))
-        conn.commit()
-    print("Migration successful: Added target_time_start to task table.")
-except Exception as e:
-    print(f"Migration failed: {e}")
+if __name__ == "__main__":
+    print(f"Schema version {schema_version()}; migrating {db.engine.url.render_as_string(hide_password=True)}")
+    db.migrate(MIGRATIONS_DIR)
+    print(f"Schema version {schema_version()}.")
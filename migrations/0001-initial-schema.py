@@ -0,0 +1,62 @@
+# Baseline schema: every table and index the app had before versioned migrations.
+# Safe on databases created by the old import-time db.create() calls and migrate.py: existing tables
+# are kept, missing columns are added and indexes are created if absent.
+import sys
+import sqlalchemy as sa
+
+meta = sa.MetaData()
+
+# TIMESTAMP on Postgres, where the worker compares these columns with datetime parameters.
+# SQLite keeps the text columns the app has always had there (ISO strings compare in order).
+DATETIME = sa.DateTime().with_variant(sa.String(), "sqlite")
+
+def table(name, *columns):
+    return sa.Table(name, meta, *columns, sa.Column("id", sa.Integer, primary_key=True))
+
+def col(name, type_=sa.String):
+    return sa.Column(name, type_)
+
+table("user_account", col("name"), col("email"), col("password_encrypted"))
+table("payment_profile", col("user_account_id", sa.Integer), col("alias"), col("cardholder_name"), col("card_number_encrypted"),
+      col("expiry_month"), col("expiry_year"), col("cvv_encrypted"), col("address_line_1"), col("city"), col("postcode"),
+      col("card_last4"))
+table("task", col("user_account_id", sa.Integer), col("payment_profile_id", sa.Integer), col("leisure_centre"), col("target_date"),
+      col("duration", sa.Integer), col("status"), col("last_checked_at", DATETIME), col("created_at", DATETIME), col("target_time_start"),
+      col("latest_time_start"), col("worker_id"), col("lease_expires_at", DATETIME), col("next_check_at", DATETIME))
+table("booking", col("task_id", sa.Integer), col("reference_number"), col("court_name"), col("price"), col("booked_at", DATETIME))
+table("system_log", col("level"), col("source"), col("message"), col("task_id", sa.Integer), col("timestamp", DATETIME))
+table("user_session", col("user_account_id", sa.Integer), col("storage_state_encrypted"), col("updated_at", DATETIME))
+table("slot_observation", col("leisure_centre"), col("duration", sa.Integer), col("target_date"), col("slot"),
+      col("appeared", sa.Boolean), col("observed_at", DATETIME))
+table("metric", col("name"), col("value", sa.Float), col("label"), col("task_id", sa.Integer), col("worker_id"), col("recorded_at", DATETIME))
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_task_due ON task (next_check_at) WHERE status IN ('PENDING', 'RUNNING')",
+    "CREATE INDEX IF NOT EXISTS ix_task_status ON task (status)",
+    "CREATE INDEX IF NOT EXISTS ix_task_created_at ON task (created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_task_user_account_id ON task (user_account_id)",
+    # Log explorer: newest-first keyset scans, optionally narrowed to one task / level / source
+    "CREATE INDEX IF NOT EXISTS ix_system_log_timestamp ON system_log (timestamp, id)",
+    "CREATE INDEX IF NOT EXISTS ix_system_log_task ON system_log (task_id, timestamp, id)",
+    "CREATE INDEX IF NOT EXISTS ix_system_log_level ON system_log (level, timestamp, id)",
+    "CREATE INDEX IF NOT EXISTS ix_system_log_source ON system_log (source, timestamp, id)",
+    # Replaying one page's slot set, and history scans by centre
+    "CREATE INDEX IF NOT EXISTS ix_slot_observation_page ON slot_observation (leisure_centre, duration, target_date, id)",
+    "CREATE INDEX IF NOT EXISTS ix_slot_observation_time ON slot_observation (observed_at)",
+    # /metrics reads a recent window per metric name
+    "CREATE INDEX IF NOT EXISTS ix_metric_name_time ON metric (name, recorded_at)",
+]
+
+engine = sa.create_engine(sys.argv[1])
+with engine.begin() as conn:
+    existing = set(sa.inspect(conn).get_table_names())
+    meta.create_all(conn, checkfirst=True)
+    # Columns the old migrate.py added one by one to tables from earlier releases
+    for name in existing & set(meta.tables):
+        have = {c["name"] for c in sa.inspect(conn).get_columns(name)}
+        for c in meta.tables[name].columns:
+            if c.name not in have:
+                conn.execute(sa.text(f"ALTER TABLE {name} ADD COLUMN {c.name} {c.type.compile(engine.dialect)}"))
+                print(f"Added {name}.{c.name}")
+    for statement in INDEXES:
+        conn.execute(sa.text(statement))
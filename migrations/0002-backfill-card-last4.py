@@ -0,0 +1,25 @@
+# Fill payment_profile.card_last4 so /settings never has to decrypt card numbers.
+import os
+import sys
+import sqlalchemy as sa
+from cryptography.fernet import Fernet, InvalidToken
+
+key = os.getenv("FERNET_KEY")
+if not key:
+    print("FERNET_KEY not set; card_last4 left empty for existing payment profiles.")
+    sys.exit(0)
+cipher = Fernet(key)
+
+engine = sa.create_engine(sys.argv[1])
+backfilled = 0
+with engine.begin() as conn:
+    rows = conn.execute(sa.text("SELECT id, card_number_encrypted FROM payment_profile WHERE card_last4 IS NULL")).all()
+    for id_, encrypted in rows:
+        try:
+            number = cipher.decrypt(encrypted.encode()).decode().replace(" ", "") if encrypted else ""
+        except InvalidToken:
+            continue
+        if number:
+            conn.execute(sa.text("UPDATE payment_profile SET card_last4 = :last4 WHERE id = :id"), {"last4": number[-4:], "id": id_})
+            backfilled += 1
+print(f"Backfilled card_last4 for {backfilled} payment profile(s).")
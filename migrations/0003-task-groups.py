@@ -0,0 +1,14 @@
+# Multi-target tasks: sibling task rows share a task_group, whose winner_task_id is claimed before paying.
+import sys
+import sqlalchemy as sa
+
+meta = sa.MetaData()
+task_group = sa.Table("task_group", meta, sa.Column("winner_task_id", sa.Integer), sa.Column("created_at", sa.DateTime().with_variant(sa.String(), "sqlite")),
+                      sa.Column("id", sa.Integer, primary_key=True))
+
+engine = sa.create_engine(sys.argv[1])
+with engine.begin() as conn:
+    task_group.create(conn, checkfirst=True)
+    if "group_id" not in {c["name"] for c in sa.inspect(conn).get_columns("task")}:
+        conn.execute(sa.text("ALTER TABLE task ADD COLUMN group_id INTEGER"))
+    conn.execute(sa.text("CREATE INDEX IF NOT EXISTS ix_task_group ON task (group_id)"))
@@ -0,0 +1,28 @@
+# Postgres databases created before versioned migrations (import-time db.create) store datetimes as VARCHAR,
+# which can't be compared with the timestamp parameters the worker and web queries bind. Convert them in place.
+import sys
+import sqlalchemy as sa
+
+COLUMNS = {
+    "task": ["last_checked_at", "created_at", "lease_expires_at", "next_check_at"],
+    "booking": ["booked_at"],
+    "system_log": ["timestamp"],
+    "user_session": ["updated_at"],
+    "slot_observation": ["observed_at"],
+    "metric": ["recorded_at"],
+    "task_group": ["created_at"],
+}
+
+engine = sa.create_engine(sys.argv[1])
+if engine.dialect.name != "postgresql":
+    # SQLite keeps ISO strings (see 0001)
+    sys.exit(0)
+
+with engine.begin() as conn:
+    inspector = sa.inspect(conn)
+    for table, columns in COLUMNS.items():
+        types = {c["name"]: c["type"] for c in inspector.get_columns(table)}
+        for column in columns:
+            if column in types and not isinstance(types[column], sa.DateTime):
+                conn.execute(sa.text(f'ALTER TABLE {table} ALTER COLUMN "{column}" TYPE timestamp USING NULLIF("{column}", \'\')::timestamp'))
+                print(f"Converted {table}.{column} to timestamp")
@@ -0,0 +1,2 @@
+-- The worker deletes metric rows older than METRIC_RETENTION_HOURS on every sampling interval
+CREATE INDEX IF NOT EXISTS ix_metric_recorded_at ON metric (recorded_at);
@@ -0,0 +1,136 @@
+from fasthtml.common import *
+import os
+import asyncio
+from datetime import datetime, timedelta
+
+# Local stand-in for bookings.better.org.uk (+ the times API and Opayo iframe) for benchmarks and offline runs.
+# Only the pages, labels and selectors the bot relies on are reproduced; every booking succeeds.
+MOCK_LATENCY_MS = int(os.getenv("MOCK_LATENCY_MS", "50"))
+MOCK_SLOT_COUNT = int(os.getenv("MOCK_SLOT_COUNT", "12"))
+MOCK_FIRST_SLOT = "07:00"
+
+def mock_slots(duration, count):
+    # (start, end) pairs from MOCK_FIRST_SLOT, back to back, never past midnight
+    start = datetime.strptime(MOCK_FIRST_SLOT, "%H:%M")
+    slots = []
+    for _ in range(count):
+        end = start + timedelta(minutes=duration)
+        if end.day != start.day:
+            break
+        slots.append((start.strftime("%H:%M"), end.strftime("%H:%M")))
+        start = end
+    return slots
+
+def _duration(activity):
+    # "badminton-60min" -> 60
+    return int(activity.rsplit("-", 1)[-1].removesuffix("min"))
+
+def create_app(latency_ms=MOCK_LATENCY_MS, slot_count=MOCK_SLOT_COUNT):
+    app, rt = fast_app(default_hdrs=False, pico=False)
+    bookings = []
+
+    async def delay():
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+
+    def Page(*content):
+        return Title("Mock Better"), Main(*content)
+
+    def CookieBanner(req):
+        if req.cookies.get("cookies_ok"):
+            return ""
+        return Div(Button("Accept All Cookies", onclick="document.cookie='cookies_ok=1; path=/'; this.parentNode.remove()"), id="cookie-banner")
+
+    def LoginHeader(req, session):
+        if session.get("user"):
+            return Div(Span(session["user"]))
+        return Div(A("Log in", href=f"/login?next={req.url.path}", data_testid="login"))
+
+    @rt('/location/{centre}/{activity}/{date}/by-time', methods=['GET'])
+    async def get(req, session, centre: str, activity: str, date: str):
+        await delay()
+        path = req.url.path
+        slots = mock_slots(_duration(activity), slot_count)
+        header = LoginHeader(req, session)
+        if not slots:
+            return Page(CookieBanner(req), header, P("No results were found at this centre"))
+        return Page(CookieBanner(req), header, H1(f"{centre} {date}"),
+                    Ul(*[Li(A(f"{s} - {e} Court {i % 3 + 1}", href=f"{path}/slot/{s}-{e}")) for i, (s, e) in enumerate(slots)]))
+
+    @rt('/location/{centre}/{activity}/{date}/by-time/slot/{slot}', methods=['GET'])
+    async def get(req, session, centre: str, activity: str, date: str, slot: str):
+        # Reachable directly, as the booking context does, or from a slot link
+        await delay()
+        return Page(CookieBanner(req), LoginHeader(req, session), H2("Your selection"), P(f"{centre} {date} {slot}"),
+                    Form(Hidden(name="slot", value=f"{centre}/{date}/{slot}"), Button("Book now", type="submit"), method="post", action="/basket"))
+
+    @rt('/basket', methods=['POST'])
+    async def post(session, slot: str):
+        await delay()
+        session["slot"] = slot
+        if not session.get("user"):
+            return RedirectResponse("/login?next=/checkout", status_code=303)
+        return RedirectResponse("/checkout", status_code=303)
+
+    @rt('/login', methods=['GET'])
+    async def get(next: str = "/"):
+        await delay()
+        return Page(Form(
+            Label("Email address or customer ID", fr="email"), Input(id="email", name="email"),
+            Label("Password", fr="password"), Input(id="password", name="password", type="password"),
+            Hidden(name="next", value=next),
+            Button("Log in", type="submit"),
+            method="post", action="/login"))
+
+    @rt('/login', methods=['POST'])
+    async def post(session, email: str, password: str, next: str = "/"):
+        await delay()
+        session["user"] = email
+        return RedirectResponse(next, status_code=303)
+
+    @rt('/checkout', methods=['GET'])
+    async def get(session):
+        await delay()
+        if not session.get("user"):
+            return RedirectResponse("/login?next=/checkout", status_code=303)
+        field = lambda label, name: (Label(label, fr=name), Input(id=name, name=name))
+        return Page(H2("Checkout"), Form(
+            Input(type="radio", id="diff_card", name="card", value="new"), Label("Pay with a different card", fr="diff_card"),
+            *field("First name", "first_name"), *field("Last name", "last_name"),
+            *field("Address line 1", "address_line_1"), *field("Town/city", "city"), *field("Postcode", "postcode"),
+            Iframe(src="/opayo/card-form", width="400", height="300"),
+            Input(type="checkbox", id="terms", name="terms"), Label("I agree to the Terms and Conditions", fr="terms"),
+            Button("Pay now", type="submit"),
+            method="post", action="/pay"))
+
+    @rt('/opayo/card-form', methods=['GET'])
+    async def get():
+        await delay()
+        return Page(Input(placeholder="Cardholder Name", name="cardholderName"), Input(placeholder="0000 0000 0000 0000", name="cardNumber"),
+                    Input(placeholder="MMYY", name="expiryDate"), Input(placeholder="123", name="securityCode"))
+
+    @rt('/pay', methods=['POST'])
+    async def post(session):
+        await delay()
+        bookings.append((session.get("user"), session.get("slot")))
+        return RedirectResponse("/confirmation", status_code=303)
+
+    @rt('/confirmation', methods=['GET'])
+    async def get():
+        await delay()
+        return Page(H2("Booking confirmed"), P(f"Reference MOCK{len(bookings):06}"))
+
+    # JSON the booking SPA reads (probe.py, AVAILABILITY_API_URL=<mock>/api)
+    @rt('/api/activities/venue/{centre}/activity/{activity}/times', methods=['GET'])
+    async def get(centre: str, activity: str, date: str = None):
+        await delay()
+        return JSONResponse({"data": [{"starts_at": {"format_24_hour": s}, "ends_at": {"format_24_hour": e}, "spaces": 1}
+                                      for s, e in mock_slots(_duration(activity), slot_count)]})
+
+    app.state.bookings = bookings
+    return app
+
+app = create_app()
+
+if __name__ == "__main__":
+    serve(port=int(os.getenv("MOCK_PORT", "5002")))
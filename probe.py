@@ -0,0 +1,62 @@
+import os
+import httpx
+from urllib.parse import urlsplit
+from browser_pool import USER_AGENT
+from slots import availability_url, BOOKING_SITE_URL
+
+# "browser" renders the availability page; "http" reads the JSON the page itself fetches
+PROBE_MODE = os.getenv("PROBE_MODE", "browser")
+AVAILABILITY_API_URL = os.getenv("AVAILABILITY_API_URL", "https://better-admin.org.uk/api")
+
+def times_path(task):
+    return f"/activities/venue/{task.leisure_centre}/activity/badminton-{task.duration}min/times"
+
+def _hhmm(value):
+    # API timestamps come as {"format_24_hour": "07:00", ...} or a plain string
+    if isinstance(value, dict):
+        value = value.get("format_24_hour") or value.get("raw")
+    return str(value)[:5] if value else None
+
+def parse_times(payload, url):
+    # Turn the times payload into the same slot hrefs the rendered page links to
+    items = payload.get("data", []) if isinstance(payload, dict) else payload
+    if isinstance(items, dict):
+        items = list(items.values())
+
+    base = urlsplit(url).path
+    hrefs = []
+    for item in items or []:
+        if not isinstance(item, dict) or (item.get("spaces") or 0) <= 0:
+            continue
+        start, end = _hhmm(item.get("starts_at")), _hhmm(item.get("ends_at"))
+        if start and end:
+            hrefs.append(f"{base}/slot/{start}-{end}")
+    return hrefs
+
+class HttpProbe:
+    """Availability from the booking site's JSON API over a pooled keep-alive client.
+
+    `base_url`/`transport` are the pluggable backend: point them at a local stand-in in tests.
+    """
+
+    def __init__(self, base_url=AVAILABILITY_API_URL, transport=None, timeout=10.0):
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            transport=transport,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            headers={
+                "Accept": "application/json",
+                "Origin": BOOKING_SITE_URL,
+                "Referer": f"{BOOKING_SITE_URL}/",
+                "User-Agent": USER_AGENT,
+            },
+        )
+
+    async def check(self, task):
+        resp = await self.client.get(times_path(task), params={"date": str(task.target_date)})
+        resp.raise_for_status()
+        return parse_times(resp.json(), availability_url(task))
+
+    async def close(self):
+        await self.client.aclose()
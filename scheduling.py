@@ -0,0 +1,59 @@
+import os
+from datetime import date, datetime, timedelta, time as dtime
+from sniper import RELEASE_TZ, SNIPE_LEAD_SECONDS, release_at
+from slots import latest_start
+
+# Recheck intervals by how likely a slot is to appear (env overridable)
+CHECK_INTERVAL_NEAR = int(os.getenv("CHECK_INTERVAL_NEAR_SECONDS", "60"))        # slot starts within NEAR_HOURS, or just released
+CHECK_INTERVAL_SOON = int(os.getenv("CHECK_INTERVAL_SOON_SECONDS", "180"))       # slot starts within a day
+CHECK_INTERVAL_DEFAULT = int(os.getenv("CHECK_INTERVAL_DEFAULT_SECONDS", "300"))
+CHECK_INTERVAL_FAR = int(os.getenv("CHECK_INTERVAL_FAR_SECONDS", "900"))         # slot is days away
+NEAR_HOURS = 3
+JUST_RELEASED_HOURS = 1
+FAR_DAYS = 3
+
+CHECK = "check"
+PARK = "park"
+EXPIRE = "expire"
+
+def _local(dt):
+    # Task timestamps are naive local time (datetime.now())
+    return dt.astimezone().replace(tzinfo=None)
+
+def slot_start(task):
+    # Latest acceptable start time, else the end of the day (any slot that day still counts)
+    day = date.fromisoformat(str(task.target_date)[:10])
+    start = dtime(23, 59)
+    try:
+        start = dtime.fromisoformat(latest_start(task) or "23:59")
+    except ValueError:
+        pass
+    return _local(datetime.combine(day, start, tzinfo=RELEASE_TZ))
+
+def plan_check(task, now=None):
+    """(action, next_check_at) for a task: check it now, park it until release, or expire it."""
+    now = now or datetime.now()
+    try:
+        start = slot_start(task)
+        release = _local(release_at(task.target_date))
+    except ValueError:
+        return CHECK, now + timedelta(seconds=CHECK_INTERVAL_DEFAULT)
+
+    if start <= now:
+        return EXPIRE, None
+
+    # Nothing to see until the date is released; wake up when the sniper window opens
+    wake = release - timedelta(seconds=SNIPE_LEAD_SECONDS)
+    if now < wake:
+        return PARK, wake
+
+    until_start = start - now
+    if until_start <= timedelta(hours=NEAR_HOURS) or now - release <= timedelta(hours=JUST_RELEASED_HOURS):
+        interval = CHECK_INTERVAL_NEAR
+    elif until_start <= timedelta(days=1):
+        interval = CHECK_INTERVAL_SOON
+    elif until_start > timedelta(days=FAR_DAYS):
+        interval = CHECK_INTERVAL_FAR
+    else:
+        interval = CHECK_INTERVAL_DEFAULT
+    return CHECK, min(now + timedelta(seconds=interval), start)
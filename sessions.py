@@ -0,0 +1,125 @@
+import os
+import json
+import time
+import random
+import asyncio
+from datetime import datetime
+from models import sessions, users, UserSession, LogLevel, encrypt_value, decrypt_value
+from slots import availability_url
+
+SESSION_MAX_AGE = int(os.getenv("SESSION_MAX_AGE_SECONDS", "7200"))          # revalidate in the background after this
+SESSION_REFRESH_INTERVAL = int(os.getenv("SESSION_REFRESH_INTERVAL_SECONDS", "300"))
+SESSION_RETRY_MAX = int(os.getenv("SESSION_RETRY_MAX_SECONDS", "21600"))      # cap on the per-account backoff after failed logins
+
+def _as_datetime(value):
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return value
+
+class SessionCache:
+    """Per-UserAccount Playwright storage state, persisted encrypted so new contexts start logged in."""
+
+    def __init__(self):
+        # user_account_id -> (storage_state, updated_at)
+        self._mem = {}
+        # user_account_id -> (consecutive failed refreshes, monotonic time of the next attempt)
+        self._failures = {}
+
+    def _row(self, user_id):
+        rows = sessions(where="user_account_id = ?", where_args=[user_id], limit=1)
+        return rows[0] if rows else None
+
+    def get(self, user_id):
+        if user_id in self._mem:
+            return self._mem[user_id][0]
+        row = self._row(user_id)
+        if not row:
+            return None
+        try:
+            state = json.loads(decrypt_value(row.storage_state_encrypted))
+        except ValueError:
+            return None
+        self._mem[user_id] = (state, _as_datetime(row.updated_at))
+        return state
+
+    def age(self, user_id):
+        if self.get(user_id) is None:
+            return None
+        updated_at = self._mem[user_id][1]
+        return (datetime.now() - updated_at).total_seconds() if updated_at else None
+
+    def save(self, user_id, state):
+        now = datetime.now()
+        self._mem[user_id] = (state, now)
+        encrypted = encrypt_value(json.dumps(state))
+        row = self._row(user_id)
+        if row:
+            row.storage_state_encrypted = encrypted
+            row.updated_at = now
+            sessions.update(row)
+        else:
+            sessions.insert(UserSession(user_account_id=user_id, storage_state_encrypted=encrypted, updated_at=now))
+
+    def invalidate(self, user_id):
+        self._mem.pop(user_id, None)
+        sessions.delete_where("user_account_id = ?", [user_id])
+
+    async def capture(self, context, user_id):
+        self.save(user_id, await context.storage_state())
+
+    async def refresh(self, bot, user, url, task):
+        # Open the stored session (or a clean one) and log in if the site has dropped it
+        async with bot.limit, bot.pool.lease(storage_state=self.get(user.id), booking=True) as lease:
+            page = lease.page
+            try:
+                await page.goto(url)
+                await bot.accept_cookies(page)
+                if await bot.login(page, user, url, task):
+                    await self.capture(lease.context, user.id)
+                    return True
+                return False
+            finally:
+                await page.close()
+
+    def _back_off(self, user_id):
+        # Exponential per account, with jitter so replicas sharing the account don't retry in step
+        count = self._failures.get(user_id, (0, 0))[0] + 1
+        delay = min(SESSION_RETRY_MAX, SESSION_REFRESH_INTERVAL * 2 ** count) * random.uniform(1, 1.25)
+        self._failures[user_id] = (count, time.monotonic() + delay)
+        return delay
+
+    async def refresh_due(self, bot, active_tasks):
+        # One pass: every account with active tasks whose session is stale and isn't backing off
+        seen = set()
+        for t in active_tasks():
+            if t.user_account_id in seen:
+                continue
+            seen.add(t.user_account_id)
+            age = self.age(t.user_account_id)
+            if age is not None and age < SESSION_MAX_AGE:
+                continue
+            if time.monotonic() < self._failures.get(t.user_account_id, (0, 0))[1]:
+                continue
+            user = users[t.user_account_id]
+            bot.log(LogLevel.INFO, f"Refreshing session for {user.name} in the background.")
+            try:
+                ok = await self.refresh(bot, user, availability_url(t), t)
+            except Exception as e:
+                bot.log(LogLevel.WARN, f"Session refresh for {user.name} failed: {e}")
+                ok = False
+            if ok:
+                self._failures.pop(user.id, None)
+            else:
+                bot.log(LogLevel.WARN, f"Next session refresh for {user.name} in {self._back_off(user.id):.0f}s.")
+
+    async def refresh_loop(self, bot, active_tasks):
+        # Keep sessions warm for every account with active tasks, off the booking critical path
+        while True:
+            try:
+                await self.refresh_due(bot, active_tasks)
+            except Exception as e:
+                bot.log(LogLevel.WARN, f"Session refresh failed: {e}")
+            await asyncio.sleep(SESSION_REFRESH_INTERVAL)
@@ -0,0 +1,91 @@
+import os
+import re
+from urllib.parse import urljoin
+from dataclasses import dataclass
+from typing import Optional
+
+# Point at a local stand-in (mock_site.py) for benchmarks
+BOOKING_SITE_URL = os.getenv("BOOKING_SITE_URL", "https://bookings.better.org.uk").rstrip("/")
+
+SLOT_SELECTOR = "a[href*='/slot/']"
+NO_RESULTS_TEXT = "No results were found at this centre"
+SLOT_HREF = re.compile(r"/slot/(\d{2}:\d{2})-(\d{2}:\d{2})")
+
+# Runs in the page: every slot link parsed in a single round trip
+EXTRACT_SLOTS_JS = r"""
+els => els.map(e => {
+    const href = e.getAttribute('href') || '';
+    const m = href.match(/\/slot\/(\d{2}:\d{2})-(\d{2}:\d{2})/);
+    if (!m) return null;
+    const text = (e.innerText || e.getAttribute('aria-label') || '').replace(/\s+/g, ' ').trim();
+    const court = text.match(/court\s*[\w-]+/i);
+    return {href: href, start: m[1], end: m[2], court: court ? court[0] : null};
+}).filter(Boolean)
+"""
+
+@dataclass(frozen=True)
+class Slot:
+    href: str
+    start: str  # "HH:MM"
+    end: str
+    court: Optional[str] = None
+
+    @property
+    def key(self):
+        return f"{self.start}-{self.end}"
+
+def slot_from_href(href):
+    m = SLOT_HREF.search(href or "")
+    return Slot(href=href, start=m.group(1), end=m.group(2)) if m else None
+
+async def extract_slots(page):
+    return [Slot(**s) for s in await page.eval_on_selector_all(SLOT_SELECTOR, EXTRACT_SLOTS_JS)]
+
+def availability_url(task):
+    duration_slug = f"badminton-{task.duration}min"
+    return f"{BOOKING_SITE_URL}/location/{task.leisure_centre}/{duration_slug}/{task.target_date}/by-time"
+
+def slot_url(slot):
+    # Hrefs from the page and the probe are site-relative
+    return urljoin(BOOKING_SITE_URL + "/", slot.href)
+
+def _hhmm(value):
+    hours, _, minutes = value.strip().partition(":")
+    return f"{int(hours):02}:{minutes or '00'}"
+
+def time_preferences(spec):
+    """Parse "19:00, 18:00-20:00" into ordered (earliest, latest) start windows."""
+    prefs = []
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        lo, _, hi = part.partition("-")
+        prefs.append((_hhmm(lo), _hhmm(hi or lo)))
+    return prefs
+
+def latest_start(task):
+    # Latest start time the task would still accept, or None when any time will do
+    his = [hi for _, hi in time_preferences(task.target_time_start)]
+    latest = task.latest_time_start
+    candidates = [t for t in [max(his) if his else None, _hhmm(latest) if latest else None] if t]
+    return min(candidates) if candidates else None
+
+def match_slot(task, slots):
+    """First slot satisfying the task's preferences, in preference order then earliest start."""
+    latest = task.latest_time_start
+    latest = _hhmm(latest) if latest else None
+    candidates = sorted((s for s in slots if not latest or s.start <= latest), key=lambda s: s.start)
+    prefs = time_preferences(task.target_time_start)
+    if not prefs:
+        return candidates[0] if candidates else None
+    for lo, hi in prefs:
+        for s in candidates:
+            if lo <= s.start <= hi:
+                return s
+    return None
+
+def slot_selector(href):
+    # Match on the "/slot/HH:MM-HH:MM" tail so hrefs built by the HTTP probe find the rendered link too
+    tail = href[href.index("/slot/"):] if "/slot/" in href else href
+    return f"a[href$='{tail}']"
@@ -0,0 +1,113 @@
+import os
+import asyncio
+from datetime import date, datetime, timedelta, time as dtime
+from zoneinfo import ZoneInfo
+from playwright.async_api import TimeoutError
+from slots import SLOT_SELECTOR, NO_RESULTS_TEXT, availability_url, match_slot, slot_selector, extract_slots
+from models import users, payments, TaskStatus, LogLevel
+
+# Better releases a new day of slots at 22:00 UK time, 7 days ahead
+BOOKING_WINDOW_DAYS = 7
+RELEASE_TIME = dtime(22, 0)
+RELEASE_TZ = ZoneInfo(os.getenv("RELEASE_TZ", "Europe/London"))
+
+SNIPE_LEAD_SECONDS = int(os.getenv("SNIPE_LEAD_SECONDS", "180"))      # open + log in this long before release
+SNIPE_WINDOW_SECONDS = int(os.getenv("SNIPE_WINDOW_SECONDS", "120"))  # keep polling this long after release
+SNIPE_POLL_INTERVAL = float(os.getenv("SNIPE_POLL_INTERVAL", "0.5"))
+SNIPE_SLOT_WAIT_MS = int(os.getenv("SNIPE_SLOT_WAIT_MS", "300"))  # per poll; ends early on slots or "No results"
+
+def release_at(target_date):
+    release_day = date.fromisoformat(str(target_date)[:10]) - timedelta(days=BOOKING_WINDOW_DAYS)
+    return datetime.combine(release_day, RELEASE_TIME, tzinfo=RELEASE_TZ)
+
+def in_snipe_window(task, now=None):
+    now = now or datetime.now(RELEASE_TZ)
+    release = release_at(task.target_date)
+    return release - timedelta(seconds=SNIPE_LEAD_SECONDS) <= now < release + timedelta(seconds=SNIPE_WINDOW_SECONDS)
+
+class Sniper:
+    """Parks logged-in sessions on the availability page ahead of the 22:00 release and books on first sight."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        # Task ids with a parked session; the regular check loop leaves these alone
+        self.active = set()
+
+    def start(self, task):
+        self.active.add(task.id)
+        job = asyncio.create_task(self.run(task))
+        job.add_done_callback(lambda _: self.active.discard(task.id))
+        return job
+
+    async def run(self, task):
+        bot = self.bot
+        release = release_at(task.target_date)
+        url = availability_url(task)
+
+        try:
+            user = users[task.user_account_id]
+            payment = payments[task.payment_profile_id]
+        except Exception as e:
+            bot.log(LogLevel.ERROR, f"Failed to fetch user/payment for task {task.id}: {e}", task.id)
+            bot.update_task_status(task, TaskStatus.FAILED)
+            return
+
+        if task.status == TaskStatus.PENDING.value:
+            bot.update_task_status(task, TaskStatus.RUNNING)
+        bot.secrets.warm(user.password_encrypted, payment.card_number_encrypted, payment.cvv_encrypted)
+
+        # Deliberately outside the worker's semaphore: a release-window session must never queue
+        # Light while polling; everything loads again once a slot is found
+        async with bot.pool.lease(storage_state=bot.sessions.get(user.id), light=True, booking=True) as lease:
+            page = lease.page
+            steps = bot.metrics.steps(task.id)
+            try:
+                # 1. Pre-warm: load, accept cookies and log in (if the cached session lapsed) before the release
+                bot.log(LogLevel.INFO, f"Sniper warming up for release at {release:%Y-%m-%d %H:%M %Z}: {url}", task.id)
+                await page.goto(url)
+                await bot.accept_cookies(page)
+                await bot.login(page, user, url, task)
+
+                # 2. Park until just before release
+                wait = (release - datetime.now(RELEASE_TZ)).total_seconds() - SNIPE_POLL_INTERVAL
+                if wait > 0:
+                    bot.log(LogLevel.INFO, f"Sniper parked, {wait:.0f}s to release.", task.id)
+                    await asyncio.sleep(wait)
+
+                # 3. Poll at sub-second intervals until a matching slot shows up
+                deadline = release + timedelta(seconds=SNIPE_WINDOW_SECONDS)
+                polls = 0
+                target = None
+                loop = asyncio.get_running_loop()
+                while datetime.now(RELEASE_TZ) < deadline:
+                    polls += 1
+                    started = loop.time()
+                    await page.reload(wait_until="domcontentloaded")
+                    try:
+                        # Either answer ends the wait, so an empty page doesn't cost the whole timeout
+                        await page.locator(SLOT_SELECTOR).or_(page.get_by_text(NO_RESULTS_TEXT)).first.wait_for(timeout=SNIPE_SLOT_WAIT_MS)
+                        target = match_slot(task, await extract_slots(page))
+                    except TimeoutError:
+                        pass
+                    if target:
+                        break
+                    # Poll start to poll start is SNIPE_POLL_INTERVAL, however long the reload took
+                    await asyncio.sleep(max(0, SNIPE_POLL_INTERVAL - (loop.time() - started)))
+
+                if not target:
+                    bot.log(LogLevel.INFO, f"Sniper found no matching slot within {SNIPE_WINDOW_SECONDS}s of release ({polls} polls).", task.id)
+                    bot.update_task_last_checked(task)
+                    return
+
+                # 4. Straight into the booking flow
+                await bot.pool.allow_all_resources(page)
+                clicked_at = datetime.now(RELEASE_TZ)
+                bot.log(LogLevel.INFO, f"Sniper release-to-click: {(clicked_at - release).total_seconds():.3f}s after {polls} polls ({target.key}).", task.id)
+                await bot.book_slot(page, task, user, payment, page.locator(slot_selector(target.href)).first, steps)
+            except Exception as e:
+                bot.log(LogLevel.ERROR, f"Unexpected error in sniper run: {e}", task.id)
+                await bot.artifacts.screenshot(page, f"error_snipe_{task.id}", failure=True)
+                lease.failed = True
+            finally:
+                steps.finish()
+                await bot.save_video(page, f"snipe_{task.id}", task.id)
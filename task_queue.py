@@ -0,0 +1,170 @@
+import os
+import socket
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy import text, bindparam
+from models import db, Task
+
+WORKER_ID = os.getenv("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+LEASE_SECONDS = int(os.getenv("TASK_LEASE_SECONDS", "120"))
+CLAIM_BATCH = int(os.getenv("TASK_CLAIM_BATCH", "50"))
+
+def _claim_sql(where, limit=False):
+    # Postgres skips rows another worker is claiming right now instead of blocking on them
+    locking = "FOR UPDATE SKIP LOCKED" if db.engine.dialect.name == "postgresql" else ""
+    return f"""
+        UPDATE task SET worker_id = :worker_id, lease_expires_at = :lease_until
+        WHERE id IN (
+            SELECT id FROM task
+            WHERE status IN ('PENDING', 'RUNNING')
+              AND (lease_expires_at IS NULL OR lease_expires_at < :now)
+              AND {where}
+            ORDER BY next_check_at NULLS FIRST
+            {"LIMIT :batch" if limit else ""}
+            {locking}
+        )
+        RETURNING *
+    """
+
+class TaskQueue:
+    """Lease-based task claiming so several worker processes never work the same task."""
+
+    def __init__(self, worker_id=WORKER_ID, lease_seconds=LEASE_SECONDS):
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        # id -> Task for every lease this worker holds
+        self.held = {}
+
+    def _claim(self, sql, **params):
+        now = datetime.now()
+        lease_until = now + timedelta(seconds=self.lease_seconds)
+        try:
+            rows = db.execute(sql, {"worker_id": self.worker_id, "lease_until": lease_until, "now": now, **params}).mappings().all()
+            db.conn.commit()
+        except Exception:
+            db.conn.rollback()
+            raise
+        claimed = [Task(**dict(r)) for r in rows]
+        for t in claimed:
+            self.held[t.id] = t
+        return claimed
+
+    def claim_due(self, batch=CLAIM_BATCH):
+        sql = text(_claim_sql("(next_check_at IS NULL OR next_check_at <= :now)", limit=True))
+        return self._claim(sql, batch=batch)
+
+    def claim_ids(self, ids):
+        if not ids:
+            return []
+        sql = text(_claim_sql("id IN :ids")).bindparams(bindparam("ids", expanding=True))
+        return self._claim(sql, ids=list(ids))
+
+    def _scalar(self, sql, params):
+        # A failed read must not leave the shared connection in an aborted transaction (Postgres)
+        try:
+            row = db.execute(text(sql), params).scalar()
+            db.conn.commit()
+        except Exception:
+            db.conn.rollback()
+            raise
+        return row
+
+    def depth(self):
+        # Active tasks due now across all workers, claimed or not (ix_task_due)
+        row = self._scalar("""
+            SELECT COUNT(*) FROM task
+            WHERE status IN ('PENDING', 'RUNNING') AND (next_check_at IS NULL OR next_check_at <= :now)
+        """, {"now": datetime.now()})
+        return row or 0
+
+    def seconds_until_next_due(self):
+        # Earliest time an unclaimed task falls due, or a lease held by another worker could lapse
+        now = datetime.now()
+        row = self._scalar("""
+            SELECT MIN(CASE WHEN lease_expires_at > :now THEN lease_expires_at ELSE COALESCE(next_check_at, :now) END)
+            FROM task
+            WHERE status IN ('PENDING', 'RUNNING') AND (worker_id IS NULL OR worker_id != :worker_id)
+        """, {"now": now, "worker_id": self.worker_id})
+        if row is None:
+            return None
+        if isinstance(row, str):
+            row = datetime.fromisoformat(row)
+        return (row - now).total_seconds()
+
+    def renew(self, ids=None):
+        # Only the given held ids (default: all of them); anything else is left to lapse
+        ids = list(self.held) if ids is None else [i for i in ids if i in self.held]
+        if not ids:
+            return
+        lease_until = datetime.now() + timedelta(seconds=self.lease_seconds)
+        sql = text("UPDATE task SET lease_expires_at = :lease_until WHERE worker_id = :worker_id AND id IN :ids").bindparams(bindparam("ids", expanding=True))
+        try:
+            db.execute(sql, {"lease_until": lease_until, "worker_id": self.worker_id, "ids": ids})
+            db.conn.commit()
+        except Exception:
+            db.conn.rollback()
+            raise
+        # Keep in-memory copies in step so later tasks.update() calls don't write a stale lease back
+        for i in ids:
+            self.held[i].lease_expires_at = lease_until
+
+    def release(self, ids):
+        ids = [i for i in ids if i in self.held]
+        if not ids:
+            return
+        sql = text("UPDATE task SET worker_id = NULL, lease_expires_at = NULL WHERE worker_id = :worker_id AND id IN :ids").bindparams(bindparam("ids", expanding=True))
+        try:
+            db.execute(sql, {"worker_id": self.worker_id, "ids": ids})
+            db.conn.commit()
+        except Exception:
+            db.conn.rollback()
+            raise
+        for i in ids:
+            t = self.held.pop(i)
+            t.worker_id = None
+            t.lease_expires_at = None
+
+    def release_all(self):
+        self.release(list(self.held))
+
+    async def heartbeat(self, working=None):
+        # working: callable returning the ids with a check, booking or sniper still running.
+        # A lease held for anything else must not be kept alive, or the task is stuck until restart.
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                self.renew(None if working is None else working())
+            except Exception as e:
+                print(f"Lease renewal failed: {e}")
+
+def claim_group_win(task):
+    # First sibling to get here pays; one conditional UPDATE on the group row, so two workers can't both win.
+    # The winner may claim again (a retried payment); nobody else can until the group is gone.
+    if not task.group_id:
+        return True
+    try:
+        won = db.execute(text("""
+            UPDATE task_group SET winner_task_id = :task_id
+            WHERE id = :group_id AND (winner_task_id IS NULL OR winner_task_id = :task_id)
+        """), {"task_id": task.id, "group_id": task.group_id}).rowcount
+        db.conn.commit()
+    except Exception:
+        db.conn.rollback()
+        raise
+    return won == 1
+
+def stop_siblings(task):
+    # After a successful booking: every other active target in the group is stopped
+    if not task.group_id:
+        return []
+    try:
+        rows = db.execute(text("""
+            UPDATE task SET status = 'STOPPED', next_check_at = NULL
+            WHERE group_id = :group_id AND id != :task_id AND status IN ('PENDING', 'RUNNING')
+            RETURNING id
+        """), {"group_id": task.group_id, "task_id": task.id}).all()
+        db.conn.commit()
+    except Exception:
+        db.conn.rollback()
+        raise
+    return [r[0] for r in rows]
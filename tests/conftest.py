@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+import subprocess
+from pathlib import Path
+
+# Migrate before any test module imports models: tables are bound to the schema that exists at import
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='better-booking-tests-')}/test.db")
+subprocess.run([sys.executable, "migrate.py"], cwd=Path(__file__).parent.parent, check=True, capture_output=True)
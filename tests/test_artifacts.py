@@ -0,0 +1,24 @@
+import os
+import time
+from artifacts import ArtifactStore
+
+def make_store(tmp_path, level="failure", **kw):
+    return ArtifactStore(level=level, screenshot_dir=str(tmp_path / "shots"), video_dir=str(tmp_path / "videos"), **kw)
+
+def test_level_decides_which_screenshots_are_kept(tmp_path):
+    assert not make_store(tmp_path, "none").wants(failure=True)
+    assert make_store(tmp_path, "failure").wants(failure=True)
+    assert not make_store(tmp_path, "failure").wants()
+    assert make_store(tmp_path, "full").wants()
+
+def test_prune_evicts_by_age_then_total_size(tmp_path):
+    store = make_store(tmp_path, max_age_days=1, max_total_mb=2 / 1024)  # 2KB cap
+    now = time.time()
+    for name, age in [("old", 3 * 86400), ("a", 300), ("b", 200), ("c", 100)]:
+        path = os.path.join(store.screenshot_dir, f"{name}.png")
+        with open(path, "wb") as f:
+            f.write(b"x" * 1024)
+        os.utime(path, (now - age, now - age))
+    assert store.prune() == 2
+    assert sorted(os.listdir(store.screenshot_dir)) == ["b.png", "c.png"]
+    store.close()
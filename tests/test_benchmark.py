@@ -0,0 +1,7 @@
+import pytest
+from benchmark import parse_args, configure
+
+def test_refuses_an_existing_database_without_the_flag(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", "postgresql://prod.example/booking")
+    with pytest.raises(SystemExit, match="--allow-database"):
+        configure(parse_args([]))
@@ -0,0 +1,207 @@
+import asyncio
+from collections import Counter
+from contextlib import asynccontextmanager, nullcontext
+import bot
+from models import Task, TaskStatus, UserAccount, PaymentProfile
+from bot import BookingBot, availability_url, match_slot, process_group
+from slots import slot_from_href, time_preferences
+
+def make_task(**kw):
+    fields = dict(user_account_id=1, payment_profile_id=1, leisure_centre="hendon-leisure-centre",
+                  target_date="2026-10-20", duration=60, status=TaskStatus.RUNNING.value)
+    fields.update(kw)
+    return Task(**fields)
+
+BASE = "/location/hendon-leisure-centre/badminton-60min/2026-10-20/by-time/slot/"
+SLOTS = [slot_from_href(BASE + t) for t in ("19:00-20:00", "07:00-08:00", "18:20-19:20")]
+
+def test_tasks_for_same_page_share_url():
+    a = make_task(target_time_start="07:00")
+    b = make_task(target_time_start="19:00")
+    assert availability_url(a) == availability_url(b)
+    assert availability_url(a).endswith("/hendon-leisure-centre/badminton-60min/2026-10-20/by-time")
+    assert availability_url(make_task(duration=40)) != availability_url(a)
+
+def test_match_slot():
+    assert match_slot(make_task(), SLOTS).start == "07:00"
+    assert match_slot(make_task(target_time_start="19:00"), SLOTS).href == BASE + "19:00-20:00"
+    assert match_slot(make_task(target_time_start="21:00"), SLOTS) is None
+    assert match_slot(make_task(), []) is None
+
+def test_match_slot_preferences_ranges_and_latest():
+    assert match_slot(make_task(target_time_start="21:00, 19:00, 07:00"), SLOTS).start == "19:00"
+    assert match_slot(make_task(target_time_start="18:00-20:00"), SLOTS).start == "18:20"
+    assert match_slot(make_task(latest_time_start="18:00"), SLOTS).start == "07:00"
+    assert match_slot(make_task(target_time_start="18:00-20:00", latest_time_start="18:00"), SLOTS) is None
+    assert time_preferences("7:00, 18:00 - 20:00") == [("07:00", "07:00"), ("18:00", "20:00")]
+
+class FakeSteps:
+    def start(self, name):
+        pass
+
+    def finish(self):
+        pass
+
+class FakeMetrics:
+    def span(self, name):
+        return nullcontext()
+
+    def count(self, name, n=1):
+        pass
+
+    def steps(self, task_id):
+        return FakeSteps()
+
+class FakePage:
+    async def goto(self, url):
+        # Reaching the slot page means the task was booked; stop there
+        raise RuntimeError("stop after lease")
+
+class FakeArtifacts:
+    async def screenshot(self, page, name, failure=False):
+        pass
+
+class CountingBot(BookingBot):
+    # The real run_task/_run_task, with the page load and the booking browser faked out
+    def __init__(self, slots):
+        self.slots, self.loads, self.booked, self.rescheduled, self.failures = slots, Counter(), [], [], {}
+        self.metrics, self.artifacts, self.limit = FakeMetrics(), FakeArtifacts(), asyncio.Semaphore(4)
+        self.secrets = self.sessions = self.pool = self
+
+    async def check_availability(self, url, group):
+        self.loads[url] += 1
+        return self.slots
+
+    @asynccontextmanager
+    async def lease(self, storage_state=None, light=False, booking=False):
+        yield self
+
+    def get(self, user_id):
+        return None
+
+    def warm(self, *secrets):
+        pass
+
+    @property
+    def page(self):
+        return FakePage()
+
+    def log(self, level, message, task_id=None):
+        if message.startswith("Matching slot"):
+            self.booked.append(task_id)
+
+    def update_task_last_checked(self, task, retry_after=None):
+        task.last_checked_at = object()
+        self.rescheduled.append(task.id)
+
+    async def save_video(self, page, name, task_id=None):
+        pass
+
+def test_each_url_is_loaded_once_and_only_matching_tasks_book(monkeypatch):
+    monkeypatch.setattr(bot, "users", {1: UserAccount(name="u", email="u@example.com", password_encrypted="x", id=1)})
+    monkeypatch.setattr(bot, "payments", {1: PaymentProfile(user_account_id=1, alias="p", id=1)})
+    monkeypatch.setattr(bot, "record_observation", lambda task, slots: (set(), set()))
+    group = [make_task(id=1, target_time_start="07:00"), make_task(id=2, target_time_start="19:00"),
+             make_task(id=3, target_time_start="21:00"), make_task(id=4, duration=40, target_time_start="21:00")]
+    # Grouped the way worker_loop does it
+    by_url = {}
+    for t in group:
+        by_url.setdefault(availability_url(t), []).append(t)
+
+    fake = CountingBot(SLOTS)
+    async def run():
+        for url, tasks in by_url.items():
+            await process_group(fake, url, tasks)
+    asyncio.run(run())
+    assert fake.loads == Counter({availability_url(group[0]): 1, availability_url(group[3]): 1})
+    assert sorted(fake.booked) == [1, 2]
+    # 3 and 4 found no match; 1 and 2 are rescheduled (backed off) because the faked booking page fails
+    assert sorted(fake.rescheduled) == [1, 2, 3, 4] and sorted(fake.failures) == [1, 2]
+
+class RetryBot(BookingBot):
+    # The real run_task/finish_attempt and DB reschedule; _run_task just fails part way or finishes normally
+    def __init__(self):
+        self.metrics, self.failures, self.fail = FakeMetrics(), {}, True
+
+    async def _run_task(self, task, slots, steps):
+        if not self.fail:
+            self.update_task_last_checked(task)
+
+    def log(self, level, message, task_id=None):
+        pass
+
+def test_failed_attempts_are_rescheduled_with_backoff():
+    from datetime import date, datetime, timedelta
+    from models import tasks
+    task = tasks.insert(make_task(target_date=str(date.today() + timedelta(days=1)), next_check_at=datetime.now() - timedelta(minutes=1)))
+    fake = RetryBot()
+    try:
+        asyncio.run(fake.run_task(task))
+        first = task.next_check_at - task.last_checked_at
+        assert first >= timedelta(seconds=bot.RETRY_BACKOFF) and fake.failures[task.id] == 1
+        asyncio.run(fake.run_task(task))
+        assert task.next_check_at - task.last_checked_at >= timedelta(seconds=2 * bot.RETRY_BACKOFF)
+        assert str(tasks[task.id].next_check_at)[:19] == str(task.next_check_at)[:19]
+
+        fake.fail = False
+        asyncio.run(fake.run_task(task))
+        assert task.id not in fake.failures
+    finally:
+        tasks.delete(task.id)
+
+class FakeField:
+    # A card input; `formatter` is what the field shows after fill() (None: exactly what was filled)
+    def __init__(self, formatter=None):
+        self.formatter, self.value, self.calls = formatter, "", []
+
+    async def fill(self, value):
+        self.calls.append(("fill", value))
+        self.value = value if self.formatter is None or not value else self.formatter(value)
+
+    async def press_sequentially(self, value, delay=0):
+        self.calls.append(("type", value, delay))
+        self.value = value
+
+    async def input_value(self):
+        return self.value
+
+    def or_(self, other):
+        return self
+
+    @property
+    def first(self):
+        return self
+
+class FakeFrame:
+    def __init__(self, field):
+        self.field, self.lookups = field, []
+
+    def get_by_placeholder(self, placeholder):
+        self.lookups.append(placeholder)
+        return self.field
+
+    def locator(self, selector):
+        self.lookups.append(selector)
+        return self.field
+
+def card_bot(fast):
+    fake = BookingBot.__new__(BookingBot)
+    fake.fast_checkout = fast
+    return fake
+
+def test_enter_card_field_fill_is_read_back():
+    field = FakeField(formatter=lambda v: f"{v[:4]} {v[4:8]} {v[8:12]} {v[12:]}")
+    frame = FakeFrame(field)
+    asyncio.run(card_bot(True).enter_card_field(frame, "0000 0000 0000 0000", "cardNumber", "4111111111111111"))
+    # The formatter's spaces don't count as a mismatch, so no retyping
+    assert field.calls == [("fill", "4111111111111111")]
+    assert frame.lookups == ["0000 0000 0000 0000", "input[name='cardNumber']"]
+
+def test_enter_card_field_mismatch_falls_back_to_typing():
+    field = FakeField(formatter=lambda v: v[:2])  # a formatter that swallowed most of the pasted value
+    asyncio.run(card_bot(True).enter_card_field(FakeFrame(field), "MMYY", "expiryDate", "1230"))
+    assert field.calls == [("fill", "1230"), ("fill", ""), ("type", "1230", 0)] and field.value == "1230"
+
+    slow = FakeField()
+    asyncio.run(card_bot(False).enter_card_field(FakeFrame(slow), "123", "securityCode", "123"))
+    assert slow.calls == [("type", "123", 100)]
@@ -0,0 +1,67 @@
+import asyncio
+import browser_pool
+from browser_pool import BrowserPool, USER_AGENT, CHECK_VIEWPORT, is_blocked
+
+def test_check_phase_blocks_heavy_and_third_party_requests():
+    assert is_blocked("image", "https://bookings.better.org.uk/logo.png")
+    assert is_blocked("font", "https://fonts.gstatic.com/x.woff2")
+    assert is_blocked("script", "https://www.googletagmanager.com/gtm.js")
+    assert not is_blocked("script", "https://bookings.better.org.uk/app.js")
+    assert not is_blocked("xhr", "https://better-admin.org.uk/api/activities")
+    assert not is_blocked("document", "https://bookings.better.org.uk/location/x/by-time")
+
+class FakeContext:
+    def __init__(self, **options):
+        self.options = options
+        self.closed = False
+
+    def on(self, event, handler):
+        pass
+
+    async def new_page(self):
+        return FakePage()
+
+    async def clear_cookies(self):
+        pass
+
+    async def close(self):
+        self.closed = True
+
+class FakePage:
+    def on(self, event, handler):
+        pass
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+
+    def is_connected(self):
+        return True
+
+    async def new_context(self, **options):
+        self.contexts.append(FakeContext(**options))
+        return self.contexts[-1]
+
+class FakeStealth:
+    async def apply_stealth_async(self, context):
+        context.options["stealth"] = True
+
+def test_check_contexts_are_pooled_and_booking_contexts_built_on_demand(monkeypatch):
+    monkeypatch.setattr(browser_pool, "Stealth", FakeStealth)
+    pool = BrowserPool(size=1, video_dir="/tmp/videos")
+    pool.browser = FakeBrowser()
+
+    async def run():
+        await pool._fill()
+        async with pool.lease() as check:
+            pass
+        async with pool.lease(storage_state={"cookies": []}, booking=True) as booking:
+            pass
+        return check, booking
+
+    check, booking = asyncio.run(run())
+    assert check.context.options == {"user_agent": USER_AGENT, "viewport": CHECK_VIEWPORT, "stealth": True}
+    assert not check.context.closed and list(pool._idle) == [check.pooled]
+    assert booking.context.options["stealth"] and booking.context.options["record_video_dir"] == "/tmp/videos"
+    assert booking.context.options["storage_state"] == {"cookies": []} and booking.context.closed
+    assert pool.stats["hits"] == 1 and pool.stats["booking"] == 1
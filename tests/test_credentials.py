@@ -0,0 +1,30 @@
+import asyncio
+from models import encrypt_value
+from credentials import CredentialCache
+
+def test_cached_values_are_zeroed_on_eviction():
+    cache = CredentialCache(ttl=60)
+    token = encrypt_value("4111111111111111")
+    assert cache.get(token) == "4111111111111111"
+    buf = cache._items[token][1]
+    cache.clear()
+    assert buf == bytearray(16) and not cache._items
+
+def test_expired_entries_are_purged():
+    cache = CredentialCache(ttl=-1)
+    token = encrypt_value("hunter2")
+    assert cache.get(token) == "hunter2"
+    cache.purge()
+    assert not cache._items
+
+def test_idle_cache_is_purged_on_a_timer():
+    cache = CredentialCache(ttl=0.05)
+    cache.get(encrypt_value("4111111111111111"))
+
+    async def idle():
+        job = asyncio.create_task(cache.purge_loop(interval=0.02))
+        await asyncio.sleep(0.2)  # no get() in the meantime
+        job.cancel()
+
+    asyncio.run(idle())
+    assert not cache._items
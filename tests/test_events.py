@@ -0,0 +1,57 @@
+import time
+import asyncio
+import pytest
+from fastsql import Database
+from sqlalchemy import text
+from events import TaskListener, notify_task_change
+from test_migrations import POSTGRES_URL, migrate
+
+def test_sqlite_listener_falls_back_to_a_plain_sleep(tmp_path):
+    db = Database(f"sqlite:///{tmp_path}/events.db")
+
+    async def run():
+        listener = TaskListener(db)
+        listener.start()
+        assert not listener.active
+        notify_task_change(db, 1, "created")  # no-op off Postgres
+        started = time.monotonic()
+        await listener.wait(0.2)
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 0.2
+
+@pytest.mark.skipif(not POSTGRES_URL, reason="TEST_POSTGRES_URL not set")
+def test_task_insert_and_update_wake_the_listener():
+    migrate(POSTGRES_URL)
+    db = Database(POSTGRES_URL)
+
+    async def woken_within(listener, timeout):
+        started = time.monotonic()
+        await listener.wait(timeout)
+        return time.monotonic() - started < timeout
+
+    async def run():
+        listener = TaskListener(db)
+        listener.start()
+        assert listener.active
+        # Same sequence as POST /tasks and DELETE /tasks/{id}: commit the row, then notify
+        task_id = db.execute(text("""
+            INSERT INTO task (user_account_id, payment_profile_id, leisure_centre, target_date, duration, status)
+            VALUES (1, 1, 'hendon-leisure-centre', '2026-10-27', 60, 'PENDING') RETURNING id
+        """)).scalar()
+        db.conn.commit()
+        try:
+            notify_task_change(db, task_id, "created")
+            assert await woken_within(listener, 5)
+            db.execute(text("UPDATE task SET status = 'STOPPED' WHERE id = :id"), {"id": task_id})
+            db.conn.commit()
+            notify_task_change(db, task_id, "stopped")
+            assert await woken_within(listener, 5)
+            # Nothing sent: the wait runs to its timeout
+            assert not await woken_within(listener, 0.2)
+        finally:
+            listener.close()
+            db.execute(text("DELETE FROM task WHERE id = :id"), {"id": task_id})
+            db.conn.commit()
+
+    asyncio.run(run())
@@ -0,0 +1,67 @@
+import asyncio
+from contextlib import nullcontext
+from datetime import datetime
+import bot
+from main import availability_patterns
+from models import Task, observations, slot_history
+from history import record_observation, current_slots
+from slots import slot_from_href
+
+BASE = "/location/hendon-leisure-centre/badminton-40min/2026-11-02/slot/"
+
+def make_task():
+    return Task(user_account_id=1, payment_profile_id=1, leisure_centre="hendon-leisure-centre",
+                target_date="2026-11-02", duration=40, status="RUNNING", id=1)
+
+def test_only_changes_are_stored():
+    task = make_task()
+    try:
+        assert record_observation(task, [slot_from_href(BASE + "07:00-07:40"), slot_from_href(BASE + "07:40-08:20")], datetime(2026, 10, 26, 22, 0)) == ({"07:00-07:40", "07:40-08:20"}, set())
+        assert record_observation(task, [slot_from_href(BASE + "07:00-07:40"), slot_from_href(BASE + "07:40-08:20")], datetime(2026, 10, 26, 22, 5)) == (set(), set())
+        assert record_observation(task, [slot_from_href(BASE + "07:40-08:20")], datetime(2026, 10, 26, 23, 0)) == (set(), {"07:00-07:40"})
+        assert current_slots(task.leisure_centre, task.duration, task.target_date) == {"07:40-08:20"}
+
+        events = slot_history(task.leisure_centre, task.duration, task.target_date, days=3650)
+        assert len(events) == 3
+        stats = availability_patterns(events)
+        assert stats["appeared_by_hour"][22] == 2 and stats["lead_days"][7] == 2
+        assert stats["median_listed_minutes"] == 60
+    finally:
+        observations.delete_where("leisure_centre = ? AND duration = ? AND target_date = ?", [task.leisure_centre, task.duration, task.target_date])
+
+class FakeMetrics:
+    def span(self, name):
+        return nullcontext()
+
+    def count(self, name, n=1):
+        pass
+
+class FakeBot:
+    def __init__(self, slots):
+        self.slots = slots
+        self.metrics = FakeMetrics()
+        self.rescheduled = []
+
+    async def check_availability(self, url, group):
+        return self.slots
+
+    def update_task_last_checked(self, task):
+        self.rescheduled.append(task.id)
+
+    async def run_task(self, task, slots=None):
+        pass
+
+    def log(self, level, message, task_id=None):
+        pass
+
+def test_timed_out_check_is_not_recorded_as_churn(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(bot, "record_observation", lambda task, slots: recorded.append(slots) or (set(), set()))
+    task = make_task()
+
+    timed_out = FakeBot(None)
+    asyncio.run(bot.process_group(timed_out, "url", [task]))
+    assert recorded == [] and timed_out.rescheduled == [task.id]
+
+    asyncio.run(bot.process_group(FakeBot([]), "url", [task]))
+    assert recorded == [[]]
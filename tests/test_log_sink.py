@@ -0,0 +1,14 @@
+from models import logs, SystemLog, LogLevel
+from log_sink import LogSink
+
+def test_records_are_flushed_in_bulk_on_close():
+    sink = LogSink(flush_size=100, flush_interval=60).start()
+    for i in range(3):
+        sink.write(SystemLog(level=LogLevel.INFO, source="test", message=f"sink message {i}", task_id=42))
+    sink.close()
+    try:
+        rows = logs(where="source = 'test' AND task_id = 42", order_by="id")
+        assert [r.message for r in rows] == ["sink message 0", "sink message 1", "sink message 2"]
+        assert rows[0].level == "INFO"
+    finally:
+        logs.delete_where("source = 'test' AND task_id = 42")
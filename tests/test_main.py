@@ -1,9 +1,33 @@
 from starlette.testclient import TestClient
 from main import app
+from models import tasks
 
 def test_get_home():
     client = TestClient(app)
     res = client.get('/')
     assert res.status_code == 200
-    assert 'Hello World' in res.text
-    assert 'FastHTML Template' in res.text
\ No newline at end of file
+    assert 'Better Booking' in res.text
+    assert 'Dashboard' in res.text
+
+def test_multi_target_task_creates_grouped_siblings():
+    client = TestClient(app)
+    res = client.post('/tasks', data={"leisure_centre": ["hendon-leisure-centre", "barnet-copthall-leisure-centre"],
+                                      "target_date": "2026-11-02", "extra_days": 1, "duration": 60,
+                                      "user_account_id": 1, "payment_profile_id": 1, "target_time_start": "19:00, 18:00-20:00"},
+                      follow_redirects=False)
+    assert res.status_code == 303
+    created = tasks(where="target_date IN ('2026-11-02', '2026-11-03')")
+    try:
+        assert sorted((t.leisure_centre, t.target_date) for t in created) == [
+            ("barnet-copthall-leisure-centre", "2026-11-02"), ("barnet-copthall-leisure-centre", "2026-11-03"),
+            ("hendon-leisure-centre", "2026-11-02"), ("hendon-leisure-centre", "2026-11-03")]
+        assert len({t.group_id for t in created}) == 1 and created[0].group_id
+        assert all(t.target_time_start == "19:00, 18:00-20:00" for t in created)
+    finally:
+        for t in created:
+            tasks.delete(t.id)
+
+def test_logs_with_an_unparseable_time_filter_is_a_bad_request():
+    client = TestClient(app)
+    assert client.get("/logs", params={"since": "yesterday"}).status_code == 400
+    assert client.get("/logs", params={"since": "2026-01-01T00:00"}).status_code == 200
@@ -0,0 +1,53 @@
+from main import metrics_text
+from datetime import datetime, timedelta
+from main import QUANTILES
+from models import metrics, Metric, metric_summaries, prune_metrics
+from metrics import Metrics, STEP_SECONDS, QUEUE_DEPTH
+
+def test_steps_are_recorded_and_exposed_as_summaries():
+    recorder = Metrics(worker_id="metrics-test").start()
+    steps = recorder.steps(task_id=7)
+    steps.start("page_load")
+    steps.start("login")
+    steps.finish()
+    steps.finish()  # No open step: nothing more recorded
+    recorder.observe(QUEUE_DEPTH, 3)
+    recorder.close()
+
+    try:
+        rows = metrics(where="worker_id = 'metrics-test'", order_by="id")
+        assert [(r.name, r.label, r.task_id) for r in rows] == [(STEP_SECONDS, "page_load", 7), (STEP_SECONDS, "login", 7), (QUEUE_DEPTH, None, None)]
+
+        body = metrics_text()
+        assert "# TYPE booking_step_seconds summary" in body
+        assert 'booking_step_seconds_count{step="login"}' in body
+        assert 'worker_queue_depth{worker="metrics-test"} 3' in body
+    finally:
+        metrics.delete_where("worker_id = 'metrics-test'")
+
+def test_per_minute_counts_recent_events():
+    recorder = Metrics(worker_id="metrics-test")
+    recorder.count("checked", 3)
+    recorder.count("checked")
+    assert recorder.per_minute("checked") == 4
+    assert recorder.per_minute("other") == 0
+
+def test_summaries_are_aggregated_in_sql_and_old_rows_pruned():
+    now = datetime.now()
+    values = [0.1 * i for i in range(1, 11)]
+    for v in values:
+        metrics.insert(Metric(name="test_step_seconds", value=v, label="sql", worker_id="metrics-sql", recorded_at=now))
+    metrics.insert(Metric(name="test_step_seconds", value=99.0, label="sql", worker_id="metrics-sql", recorded_at=now - timedelta(days=30)))
+
+    try:
+        rows = [r for r in metric_summaries(now - timedelta(minutes=5), QUANTILES) if r[0] == "test_step_seconds"]
+        assert len(rows) == 1
+        _, label, count, total, p50, p90, p99 = rows[0]
+        # Same nearest-rank picks as sorted(values)[min(n - 1, int(q * n))]
+        assert (label, count, round(total, 6)) == ("sql", 10, 5.5)
+        assert [round(p, 6) for p in (p50, p90, p99)] == [0.6, 1.0, 1.0]
+
+        assert prune_metrics(hours=24) >= 1
+        assert [m.value for m in metrics(where="worker_id = 'metrics-sql'")] == values
+    finally:
+        metrics.delete_where("worker_id = 'metrics-sql'")
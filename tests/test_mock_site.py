@@ -0,0 +1,44 @@
+import asyncio
+import httpx
+from starlette.testclient import TestClient
+from models import Task, TaskStatus
+from mock_site import create_app, mock_slots
+from probe import HttpProbe
+from slots import match_slot, slot_from_href, slot_url, BOOKING_SITE_URL
+
+TASK = Task(user_account_id=1, payment_profile_id=1, leisure_centre="hendon-leisure-centre",
+            target_date="2026-10-20", duration=60, status=TaskStatus.RUNNING.value, target_time_start="09:00", id=1)
+PAGE = "/location/hendon-leisure-centre/badminton-60min/2026-10-20/by-time"
+
+def test_mock_slots_are_back_to_back():
+    assert mock_slots(40, 3) == [("07:00", "07:40"), ("07:40", "08:20"), ("08:20", "09:00")]
+
+def test_booking_flow_pages():
+    client = TestClient(create_app(latency_ms=0, slot_count=4))
+    page = client.get(PAGE).text
+    assert "Accept All Cookies" in page and 'data-testid="login"' in page
+    assert f'href="{PAGE}/slot/07:00-08:00"' in page
+
+    # Booking contexts open the slot page directly
+    slot = slot_from_href(f"{PAGE}/slot/07:00-08:00")
+    assert slot_url(slot) == f"{BOOKING_SITE_URL}{PAGE}/slot/07:00-08:00"
+    page = client.get(slot.href).text
+    assert "Book now" in page and 'data-testid="login"' in page
+
+    res = client.post("/basket", data={"slot": "07:00-08:00"})
+    assert res.url.path == "/login"
+    res = client.post("/login", data={"email": "a@example.com", "password": "pw", "next": "/checkout"})
+    assert res.url.path == "/checkout" and "Pay with a different card" in res.text and "opayo" in res.text
+    assert client.post("/pay").url.path == "/confirmation"
+
+def test_probe_reads_mock_times_api():
+    async def run():
+        probe = HttpProbe(base_url="http://mock/api", transport=httpx.ASGITransport(app=create_app(latency_ms=0, slot_count=4)))
+        try:
+            return await probe.check(TASK)
+        finally:
+            await probe.close()
+
+    slots = [slot_from_href(h) for h in asyncio.run(run())]
+    assert len(slots) == 4
+    assert match_slot(TASK, slots).key == "09:00-10:00"
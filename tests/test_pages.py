@@ -0,0 +1,64 @@
+import asyncio
+from datetime import datetime, timedelta
+import main
+from main import live_updates
+from models import logs, tasks, SystemLog, Task, log_page, task_page
+
+def test_log_page_keyset_navigation():
+    base = datetime(2020, 1, 1)
+    rows = [logs.insert(SystemLog(level="INFO", source="page-test", message=f"line {i}", timestamp=base + timedelta(minutes=i)))
+            for i in range(5)]
+    try:
+        first, has_older, has_newer = log_page(source="page-test", limit=2)
+        assert [l.message for l in first] == ["line 4", "line 3"] and has_older and not has_newer
+
+        second, has_older, has_newer = log_page(source="page-test", before=first[-1].id, limit=2)
+        assert [l.message for l in second] == ["line 2", "line 1"] and has_older and has_newer
+
+        back, _, has_newer = log_page(source="page-test", after=second[0].id, limit=2)
+        assert [l.message for l in back] == ["line 4", "line 3"] and not has_newer
+    finally:
+        for r in rows:
+            logs.delete(r.id)
+
+def test_task_page_keyset_navigation_and_filters():
+    base = datetime(2020, 1, 1)
+    # Two rows share a created_at, so the id tiebreak is exercised across the page boundary
+    created = [base, base + timedelta(minutes=1), base + timedelta(minutes=1), base + timedelta(minutes=2), base + timedelta(minutes=3)]
+    rows = [tasks.insert(Task(user_account_id=1, payment_profile_id=1, leisure_centre=("hendon-leisure-centre", "barnet-copthall-leisure-centre")[i % 2],
+                              target_date="2031-05-05", duration=60, status=("RUNNING", "STOPPED")[i % 2], created_at=ts))
+            for i, ts in enumerate(created)]
+    ids = [t.id for t in rows]
+    try:
+        first, has_more = task_page(date="2031-05-05", limit=3)
+        assert [t.id for t, _ in first] == [ids[4], ids[3], ids[2]] and has_more
+        second, has_more = task_page(date="2031-05-05", before=first[-1][0].id, limit=3)
+        assert [t.id for t, _ in second] == [ids[1], ids[0]] and not has_more
+
+        running, _ = task_page(status="RUNNING", date="2031-05-05")
+        assert [t.id for t, _ in running] == [ids[4], ids[2], ids[0]]
+        barnet, _ = task_page(centre="barnet-copthall-leisure-centre", date="2031-05-05")
+        assert [t.id for t, _ in barnet] == [ids[3], ids[1]]
+        assert task_page(date="2031-05-06") == ([], False)
+    finally:
+        for i in ids:
+            tasks.delete(i)
+
+def test_live_updates_push_changed_task_rows(monkeypatch):
+    monkeypatch.setattr(main, "SSE_POLL_INTERVAL", 0.01)
+    t = tasks.insert(Task(user_account_id=1, payment_profile_id=1, leisure_centre="hendon-leisure-centre",
+                          target_date="2026-10-27", duration=60, status="RUNNING"))
+
+    async def first_event():
+        stream = live_updates([t.id], None)
+        pending = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.05)
+        t.status = "SUCCESS"
+        tasks.update(t)
+        return await asyncio.wait_for(pending, 1)
+
+    try:
+        message = asyncio.run(first_event())
+        assert message.startswith(f"event: task-{t.id}\n") and "SUCCESS" in message
+    finally:
+        tasks.delete(t.id)
@@ -0,0 +1,35 @@
+import asyncio
+import httpx
+from models import Task, TaskStatus
+from probe import HttpProbe, parse_times
+from slots import match_slot, slot_from_href
+
+TASK = Task(user_account_id=1, payment_profile_id=1, leisure_centre="hendon-leisure-centre",
+            target_date="2026-10-20", duration=60, status=TaskStatus.RUNNING.value, target_time_start="19:00", id=1)
+
+TIMES = {"data": [
+    {"starts_at": {"format_24_hour": "07:00"}, "ends_at": {"format_24_hour": "08:00"}, "spaces": 0},
+    {"starts_at": {"format_24_hour": "19:00"}, "ends_at": {"format_24_hour": "20:00"}, "spaces": 2},
+]}
+
+def test_parse_times_skips_full_slots():
+    hrefs = parse_times(TIMES, "https://bookings.better.org.uk/location/hendon-leisure-centre/badminton-60min/2026-10-20/by-time")
+    assert hrefs == ["/location/hendon-leisure-centre/badminton-60min/2026-10-20/by-time/slot/19:00-20:00"]
+
+def test_http_probe_against_stand_in_backend():
+    seen = []
+    def handler(request):
+        seen.append(request.url)
+        return httpx.Response(200, json=TIMES)
+
+    async def run():
+        probe = HttpProbe(base_url="http://stand-in", transport=httpx.MockTransport(handler))
+        try:
+            return await probe.check(TASK)
+        finally:
+            await probe.close()
+
+    hrefs = asyncio.run(run())
+    assert seen[0].path == "/activities/venue/hendon-leisure-centre/activity/badminton-60min/times"
+    assert seen[0].params["date"] == "2026-10-20"
+    assert match_slot(TASK, [slot_from_href(h) for h in hrefs]).href.endswith("/slot/19:00-20:00")
@@ -0,0 +1,25 @@
+from datetime import datetime, timedelta
+from models import Task, TaskStatus
+from scheduling import plan_check, slot_start, CHECK, PARK, EXPIRE, CHECK_INTERVAL_NEAR, CHECK_INTERVAL_FAR
+from sniper import release_at
+
+def make_task(target_date, target_time_start="19:00"):
+    return Task(user_account_id=1, payment_profile_id=1, leisure_centre="hendon-leisure-centre", target_date=target_date,
+                duration=60, status=TaskStatus.RUNNING.value, target_time_start=target_time_start, id=1)
+
+def test_task_before_release_is_parked_until_sniper_window():
+    task = make_task("2026-10-27")
+    action, wake = plan_check(task, datetime(2026, 10, 10, 12, 0))
+    assert action == PARK
+    assert wake < release_at(task.target_date).astimezone().replace(tzinfo=None)
+
+def test_past_task_expires():
+    assert plan_check(make_task("2026-10-27"), datetime(2026, 10, 28, 9, 0)) == (EXPIRE, None)
+
+def test_checks_are_frequent_close_to_the_slot_and_sparse_far_from_it():
+    task = make_task("2026-10-27")
+    start = slot_start(task)
+    near = start - timedelta(hours=2)
+    assert plan_check(task, near) == (CHECK, near + timedelta(seconds=CHECK_INTERVAL_NEAR))
+    far = start - timedelta(days=5)
+    assert plan_check(task, far) == (CHECK, far + timedelta(seconds=CHECK_INTERVAL_FAR))
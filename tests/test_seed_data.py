@@ -0,0 +1,28 @@
+from datetime import datetime
+from sqlalchemy import text
+from models import db
+from seed_data import seed
+
+TABLES = ("system_log", "task", "payment_profile", "user_account")
+
+def scalar(sql):
+    n = db.execute(text(sql)).scalar()
+    db.conn.commit()
+    return n
+
+def test_seed_inserts_requested_volumes():
+    last = {t: scalar(f"SELECT COALESCE(MAX(id), 0) FROM {t}") for t in TABLES}
+    try:
+        seed(n_users=3, n_tasks=40, n_logs=120, batch=25)
+        assert scalar(f"SELECT COUNT(*) FROM user_account WHERE id > {last['user_account']}") == 3
+        assert scalar(f"SELECT COUNT(*) FROM task WHERE id > {last['task']}") == 40
+        assert scalar(f"SELECT COUNT(*) FROM system_log WHERE id > {last['system_log']}") == 120
+        # Active seeded tasks are parked, so no worker on this database would pick them up
+        due = db.execute(text(f"""SELECT COUNT(*) FROM task WHERE id > {last['task']} AND status IN ('PENDING', 'RUNNING')
+                                  AND (next_check_at IS NULL OR next_check_at <= :now)"""), {"now": datetime.now()}).scalar()
+        db.conn.commit()
+        assert due == 0
+    finally:
+        for t in TABLES:
+            db.execute(text(f"DELETE FROM {t} WHERE id > {last[t]}"))
+        db.conn.commit()
@@ -0,0 +1,77 @@
+import asyncio
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+import sessions as sessions_module
+from models import sessions, Task, UserAccount
+from sessions import SessionCache, SESSION_MAX_AGE, SESSION_REFRESH_INTERVAL
+
+STATE = {"cookies": [{"name": "sid", "value": "abc"}], "origins": []}
+
+def test_save_get_expiry_and_invalidate():
+    cache = SessionCache()
+    try:
+        assert cache.get(901) is None and cache.age(901) is None
+        cache.save(901, STATE)
+        assert cache.get(901) == STATE and cache.age(901) < 5
+
+        # A fresh cache (another process) reads the encrypted row back
+        other = SessionCache()
+        assert other.get(901) == STATE
+
+        row = sessions(where="user_account_id = ?", where_args=[901])[0]
+        row.updated_at = datetime.now() - timedelta(seconds=SESSION_MAX_AGE + 60)
+        sessions.update(row)
+        assert SessionCache().age(901) > SESSION_MAX_AGE
+
+        cache.save(901, {**STATE, "origins": ["x"]})
+        assert len(sessions(where="user_account_id = ?", where_args=[901])) == 1
+
+        cache.invalidate(901)
+        assert cache.get(901) is None and SessionCache().get(901) is None
+    finally:
+        sessions.delete_where("user_account_id = ?", [901])
+
+class FakeBot:
+    def log(self, level, message, task_id=None):
+        pass
+
+class FailingCache(SessionCache):
+    def __init__(self):
+        super().__init__()
+        self.attempts = 0
+        self.ok = False
+
+    def age(self, user_id):
+        return None
+
+    async def refresh(self, bot, user, url, task):
+        self.attempts += 1
+        if not self.ok:
+            raise RuntimeError("login form never appeared")
+        return True
+
+def test_failed_refreshes_back_off_per_account(monkeypatch):
+    monkeypatch.setattr(sessions_module, "users", {902: UserAccount(name="u", email="u@example.com", password_encrypted="x", id=902)})
+    clock = [1000.0]
+    monkeypatch.setattr(sessions_module, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    task = Task(user_account_id=902, payment_profile_id=1, leisure_centre="hendon-leisure-centre", target_date="2026-11-02", duration=60, id=1)
+    cache = FailingCache()
+    refresh = lambda: asyncio.run(cache.refresh_due(FakeBot(), lambda: [task, task]))
+
+    refresh()
+    assert cache.attempts == 1
+    first_retry = cache._failures[902][1]
+    assert first_retry - clock[0] >= 2 * SESSION_REFRESH_INTERVAL
+
+    clock[0] += SESSION_REFRESH_INTERVAL  # next pass: still backing off
+    refresh()
+    assert cache.attempts == 1
+
+    clock[0] = first_retry
+    refresh()
+    assert cache.attempts == 2 and cache._failures[902][1] - clock[0] >= 4 * SESSION_REFRESH_INTERVAL
+
+    clock[0] = cache._failures[902][1]
+    cache.ok = True
+    refresh()
+    assert cache.attempts == 3 and 902 not in cache._failures
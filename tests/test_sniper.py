@@ -0,0 +1,19 @@
+from datetime import datetime, timedelta
+from models import Task, TaskStatus
+from sniper import RELEASE_TZ, release_at, in_snipe_window
+
+def make_task(target_date):
+    return Task(user_account_id=1, payment_profile_id=1, leisure_centre="hendon-leisure-centre",
+                target_date=target_date, duration=60, status=TaskStatus.RUNNING.value, id=1)
+
+def test_release_is_22_00_seven_days_before():
+    release = release_at("2026-10-27")
+    assert release == datetime(2026, 10, 20, 22, 0, tzinfo=RELEASE_TZ)
+
+def test_snipe_window_opens_shortly_before_release():
+    task = make_task("2026-10-27")
+    release = release_at(task.target_date)
+    assert not in_snipe_window(task, release - timedelta(hours=1))
+    assert in_snipe_window(task, release - timedelta(seconds=60))
+    assert in_snipe_window(task, release + timedelta(seconds=30))
+    assert not in_snipe_window(task, release + timedelta(hours=1))
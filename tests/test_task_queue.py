@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+from models import tasks, task_groups, Task, TaskGroup, TaskStatus
+from task_queue import TaskQueue, claim_group_win, stop_siblings
+
+def make_task(status=TaskStatus.PENDING.value, **kw):
+    return tasks.insert(Task(user_account_id=1, payment_profile_id=1, leisure_centre="hendon-leisure-centre",
+                             target_date="2026-10-27", duration=60, status=status, **kw))
+
+def test_due_task_is_claimed_by_one_worker_only():
+    t = make_task()
+    a, b = TaskQueue("worker-a"), TaskQueue("worker-b")
+    try:
+        assert t.id in [c.id for c in a.claim_due()]
+        assert t.id not in [c.id for c in b.claim_due()]
+        assert tasks[t.id].worker_id == "worker-a"
+    finally:
+        a.release_all()
+        tasks.delete(t.id)
+
+def test_released_and_expired_leases_are_reclaimed():
+    t = make_task()
+    a, b = TaskQueue("worker-a"), TaskQueue("worker-b", lease_seconds=-1)
+    try:
+        b.claim_due()
+        # worker-b's lease is already in the past, as if it had crashed
+        assert t.id in [c.id for c in a.claim_due()]
+        a.release([t.id])
+        assert tasks[t.id].worker_id is None
+        assert t.id in [c.id for c in a.claim_ids([t.id])]
+    finally:
+        a.release_all()
+        tasks.delete(t.id)
+
+def test_task_is_not_due_before_next_check_at():
+    t = make_task(TaskStatus.RUNNING.value, next_check_at=datetime.now() + timedelta(seconds=30))
+    q = TaskQueue("worker-a")
+    try:
+        assert t.id not in [c.id for c in q.claim_due()]
+    finally:
+        q.release_all()
+        tasks.delete(t.id)
+
+def test_depth_and_next_due_read_the_datetime_columns():
+    # Same datetime comparisons as claim_due; these broke on Postgres while the columns were VARCHAR
+    later = make_task(TaskStatus.RUNNING.value, next_check_at=datetime.now() + timedelta(seconds=30))
+    due = make_task(TaskStatus.RUNNING.value, next_check_at=datetime.now() - timedelta(seconds=5))
+    q = TaskQueue("worker-a")
+    try:
+        assert q.depth() >= 1
+        assert q.seconds_until_next_due() <= 0
+        q.claim_ids([due.id])
+        # Due task now leased to this worker, so only the other task (or anything older) counts
+        assert TaskQueue("worker-b").seconds_until_next_due() <= 30
+    finally:
+        q.release_all()
+        tasks.delete(later.id)
+        tasks.delete(due.id)
+
+def test_first_sibling_to_pay_wins_and_stops_the_rest():
+    group = task_groups.insert(TaskGroup())
+    a, b, c = (make_task(TaskStatus.RUNNING.value, group_id=group.id) for _ in range(3))
+    done = make_task(TaskStatus.STOPPED.value, group_id=group.id)
+    ungrouped = make_task(group_id=None)
+    try:
+        assert claim_group_win(b)
+        assert not claim_group_win(a)
+        assert claim_group_win(b)  # a retried payment by the winner
+        assert sorted(stop_siblings(b)) == sorted([a.id, c.id])
+        assert [tasks[t.id].status for t in (a, b, c, done)] == ["STOPPED", "RUNNING", "STOPPED", "STOPPED"]
+        assert claim_group_win(ungrouped)
+    finally:
+        for t in (a, b, c, done, ungrouped):
+            tasks.delete(t.id)
+        task_groups.delete(group.id)
@@ -0,0 +1,145 @@
+import time
+import asyncio
+from collections import Counter
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta
+import bot
+from models import tasks, Task, TaskStatus, LeisureCentre
+from task_queue import TaskQueue
+
+class FakePool:
+    browser = object()
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def report(self):
+        return "fake pool"
+
+class FakeSessions:
+    async def refresh_loop(self, bot, active_tasks):
+        await asyncio.Event().wait()
+
+class FakeMetrics:
+    def span(self, name):
+        return nullcontext()
+
+    def count(self, name, n=1):
+        pass
+
+    def observe(self, name, value, label=None, task_id=None):
+        pass
+
+    def per_minute(self, name):
+        return 0
+
+    def prune(self):
+        pass
+
+    def close(self):
+        pass
+
+class Closeable:
+    def close(self):
+        pass
+
+    def clear(self):
+        pass
+
+    async def purge_loop(self):
+        await asyncio.Event().wait()
+
+class WorkerBot:
+    """Just enough of BookingBot for worker_loop: checks are counted, nothing is booked."""
+
+    def __init__(self, fail_first=None, check_seconds=0, concurrency=1):
+        self.pool, self.probe, self.sessions, self.metrics = FakePool(), None, FakeSessions(), FakeMetrics()
+        self.log_sink = self.artifacts = self.secrets = Closeable()
+        self.limit = asyncio.Semaphore(concurrency)
+        self.fail_first, self.check_seconds = fail_first, check_seconds
+        self.checks, self.running, self.peak = Counter(), 0, 0
+        self.checking, self.overlapped = set(), False
+
+    async def check_availability(self, url, group):
+        async with self.limit:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+            try:
+                for t in group:
+                    self.checks[t.id] += 1
+                    self.overlapped |= t.id in self.checking
+                    self.checking.add(t.id)
+                if self.fail_first in self.checks and self.checks[self.fail_first] == 1:
+                    raise RuntimeError("browser relaunch failed")
+                await asyncio.sleep(self.check_seconds)
+                return []
+            finally:
+                self.running -= 1
+                self.checking.difference_update(t.id for t in group)
+
+    async def run_task(self, task, slots=None):
+        pass
+
+    def update_task_status(self, task, status):
+        task.status = status.value
+
+    def update_task_last_checked(self, task):
+        pass
+
+    def log(self, level, message, task_id=None):
+        pass
+
+def make_tasks(n):
+    # One availability URL each (up to 6), claimed in order: the first is the longest overdue
+    centres = list(LeisureCentre)
+    return [tasks.insert(Task(user_account_id=1, payment_profile_id=1, leisure_centre=centres[i % len(centres)].value,
+                              target_date=str(date.today() + timedelta(days=1)), duration=(60, 40)[i // len(centres) % 2],
+                              status=TaskStatus.RUNNING.value, next_check_at=datetime.now() - timedelta(minutes=n - i)))
+            for i in range(n)]
+
+def run_worker(monkeypatch, fake, until, mode="sequential", concurrency=1, seconds=5, lease_seconds=3):
+    monkeypatch.setattr(bot, "TaskQueue", lambda: TaskQueue(worker_id="test-worker", lease_seconds=lease_seconds))
+    monkeypatch.setattr(bot, "in_snipe_window", lambda t: False)
+    monkeypatch.setattr(bot, "record_observation", lambda task, slots: (set(), set()))
+    monkeypatch.setattr(bot, "POLL_INTERVAL", 0.05)
+    monkeypatch.setattr(bot, "FALLBACK_POLL_INTERVAL", 0.05)
+
+    async def run():
+        job = asyncio.create_task(bot.worker_loop(mode, concurrency, bot=fake))
+        deadline = asyncio.get_running_loop().time() + seconds
+        while not until() and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(0.05)
+        job.cancel()
+        await asyncio.gather(job, return_exceptions=True)
+    asyncio.run(run())
+
+def test_tasks_claimed_before_a_failed_check_are_released(monkeypatch):
+    first, second = make_tasks(2)
+    fake = WorkerBot(fail_first=first.id)
+    try:
+        run_worker(monkeypatch, fake, until=lambda: fake.checks[second.id] and fake.checks[first.id] > 1)
+        assert fake.checks[first.id] > 1 and fake.checks[second.id] >= 1
+        assert all(t.worker_id is None for t in (tasks[first.id], tasks[second.id]))
+    finally:
+        for t in (first, second):
+            tasks.delete(t.id)
+
+def test_async_mode_checks_groups_concurrently_and_releases_each_on_finish(monkeypatch):
+    group = make_tasks(5)
+    ids = [t.id for t in group]
+    fake = WorkerBot(check_seconds=0.3, concurrency=2)
+    try:
+        started = time.monotonic()
+        # Every task checked twice: the second claim needs the first job's lease released, well before it would lapse
+        run_worker(monkeypatch, fake, until=lambda: all(fake.checks[i] >= 2 for i in ids), mode="async", concurrency=2,
+                   seconds=8, lease_seconds=30)
+        assert all(fake.checks[i] >= 2 for i in ids) and time.monotonic() - started < 30
+        assert fake.peak == 2  # five groups at once, held to --concurrency by the semaphore
+        assert not fake.overlapped  # a task is never checked again while its check is in flight
+        assert all(tasks[i].worker_id is None for i in ids)
+    finally:
+        for i in ids:
+            tasks.delete(i)